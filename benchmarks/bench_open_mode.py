@@ -0,0 +1,45 @@
+"""
+WordNetDbのオープンモードごとの検索レイテンシを計測する
+
+python benchmarks/bench_open_mode.py [db/wnjpn.db] [検索回数]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from snark import wordnetdb
+
+
+def sample_lemmas(path, n, seed=0):
+    wn = wordnetdb.WordNetDb(path)
+    lemmas = [r[0] for r in wn.conn.execute('select lemma from word')]
+    wn.conn.close()
+    random.seed(seed)
+    return [random.choice(lemmas) for _ in range(n)]
+
+
+def bench(path, mode, lemmas):
+    t0 = time.perf_counter()
+    wn = wordnetdb.WordNetDb(path, mode=mode)
+    t1 = time.perf_counter()
+    for lemma in lemmas:
+        wn.get_same_words_by_lemma(lemma)
+        wn.get_word_info_by_lemma(lemma)
+    t2 = time.perf_counter()
+    return (t1 - t0, (t2 - t1) / len(lemmas))
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'db/wnjpn.db'
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    lemmas = sample_lemmas(path, n)
+    print('mode\topen[ms]\tlookup[us]')
+    for mode in ['rw', 'memory', 'ro']:
+        (t_open, t_lookup) = bench(path, mode, lemmas)
+        print('%s\t%.1f\t%.1f' % (mode, t_open * 1e3, t_lookup * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+合成DBでWordNetDbとPhraseNetDbの主なメソッドのレイテンシを計測し、JSONに書き出す
+
+python benchmarks/bench_suite.py [--db db/synth.db] [--scale 0.1] [--out result.json]
+                                 [--baseline old.json] [--tolerance 1.2]
+
+--dbのファイルがなければsynthdb.make_dbで作る
+--baselineを指定すると、平均レイテンシが基準のtolerance倍を超えたメソッドを表示し、終了コード1で終わる
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from snark import wordnetdb
+import synthdb
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def summarize(times):
+    """
+    1回ごとの秒数のリストを集計する
+    """
+    times = sorted(times)
+    n = len(times)
+
+    def pct(p):
+        return times[min(int(n * p), n - 1)] * 1e6
+    return {'n': n, 'total_s': sum(times), 'mean_us': sum(times) / n * 1e6,
+            'p50_us': pct(0.5), 'p95_us': pct(0.95), 'p99_us': pct(0.99),
+            'max_us': times[-1] * 1e6}
+
+
+def timeit(f, args):
+    """
+    argsの各要素でfを呼び出し、1回ごとの秒数を集計する
+    """
+    times = []
+    for a in args:
+        t0 = time.perf_counter()
+        f(a)
+        times.append(time.perf_counter() - t0)
+    return summarize(times)
+
+
+def bench_reads(path, n, rnd):
+    wn = wordnetdb.WordNetDb(path)
+    lemmas = [r[0] for r in wn.conn.execute('SELECT lemma FROM word')]
+    synsets = [wordnetdb.SynSet(*r) for r in wn.conn.execute('SELECT * FROM synset')]
+    # next関係の連鎖の先頭, get_synlink_nextで連鎖の終わりまで何段もたどる
+    heads = [wordnetdb.SynSet(r[0]) for r in wn.conn.execute(
+        "SELECT DISTINCT synset1 FROM synlink WHERE link='next'"
+        " AND synset1 NOT IN (SELECT synset2 FROM synlink WHERE link='next')"
+        ' ORDER BY synset1')]
+    lemmas = [rnd.choice(lemmas) for _ in range(n)]
+    synsets = [rnd.choice(synsets) for _ in range(n)]
+    results = {
+        'get_words': timeit(wn.get_words, lemmas),
+        'get_same_words_by_lemma': timeit(wn.get_same_words_by_lemma, lemmas),
+        'get_synlink_info': timeit(wn.get_synlink_info, synsets),
+    }
+    if len(heads) > 0:
+        heads = [rnd.choice(heads) for _ in range(n)]
+        results['get_synlink_next'] = timeit(lambda s: wn.get_synlink_next(s, 'next'), heads)
+        results['get_synlink_next']['hops'] = sum(
+            len(wn.get_synlink_next(s, 'next')) for s in heads[:100]) / min(len(heads), 100)
+    wn.close()
+    return results
+
+
+def bench_writes(path, n, batch, rnd):
+    # 書き込みは元のDBを変えないようにコピーに対して行う
+    tmp = tempfile.mkdtemp()
+    try:
+        copy = os.path.join(tmp, 'bench.db')
+        shutil.copy(path, copy)
+        wn = wordnetdb.WordNetDb(copy)
+        names = ['bench%d' % i for i in range(n)]
+        results = {'add_word': timeit(wn.add_word, names)}
+
+        # 半分は既にある説明, 半分は新しい説明
+        existing = wn.conn.execute('SELECT * FROM synset_def').fetchall()
+        batches = []
+        for i in range(max(n // 10, 1)):
+            rows = [rnd.choice(existing) for _ in range(batch // 2)]
+            rows += [(rnd.choice(existing)[0], 'jpn', 'bench %d %d' % (i, j), '0')
+                     for j in range(batch - batch // 2)]
+            batches.append(rows)
+        results['insert_synset_def_all'] = timeit(wn.insert_synset_def_all, batches)
+        results['insert_synset_def_all']['batch'] = batch
+        wn.close()
+    finally:
+        shutil.rmtree(tmp)
+    return results
+
+
+def bench_phrases(path, n, rnd):
+    try:
+        from snark import phrasenetdb
+        pn = phrasenetdb.PhraseNetDb(path)
+    except ImportError as e:
+        # PhraseNetDbはpandasが必要
+        return {'PhraseNetDb.get_phrases': {'skipped': str(e)}}
+    pn.load_file(os.path.join(ROOT, 'dict', 'phrases.csv'))
+    words = [str(p[1]) for p in pn.startdict.values[1:] if len(str(p[1]).strip()) > 0]
+    sentences = [''.join(rnd.choice(words) for _ in range(rnd.randint(2, 6))) for _ in range(n)]
+    return {'PhraseNetDb.get_phrases': timeit(pn.get_phrases, sentences)}
+
+
+def describe_db(path):
+    """
+    DBのテーブルごとの行数とインデックス名
+    """
+    conn = sqlite3.connect(path)
+    rows = {t: conn.execute('SELECT count(*) FROM %s' % t).fetchone()[0]
+            for t in ['word', 'sense', 'synset', 'synset_def', 'synlink']}
+    indexes = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' ORDER BY name")]
+    conn.close()
+    return {'rows': rows, 'indexes': indexes}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def compare(results, baseline, tolerance):
+    """
+    基準の結果と平均レイテンシを比べ、遅くなったメソッドを返す
+    """
+    slower = []
+    print('name\tbaseline[us]\tcurrent[us]\tratio')
+    for (name, r) in results.items():
+        b = baseline.get(name)
+        if b is None or 'mean_us' not in b or 'mean_us' not in r:
+            continue
+        ratio = r['mean_us'] / b['mean_us'] if b['mean_us'] > 0 else 0
+        print('%s\t%.1f\t%.1f\t%.2f' % (name, b['mean_us'], r['mean_us'], ratio))
+        if ratio > tolerance:
+            slower.append(name)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成DBでのベンチマーク')
+    parser.add_argument('--db', default='')
+    parser.add_argument('--scale', type=float, default=0.1)
+    parser.add_argument('--fanout', default='pareto', choices=['fixed', 'poisson', 'pareto'])
+    parser.add_argument('--indexes', action='store_true', help='合成DBにインデックスを作る')
+    parser.add_argument('-n', type=int, default=1000, help='メソッドごとの呼び出し回数')
+    parser.add_argument('--batch', type=int, default=1000, help='insert_synset_def_allの1回の件数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='')
+    parser.add_argument('--baseline', default='')
+    parser.add_argument('--tolerance', type=float, default=1.2)
+    args = parser.parse_args()
+
+    tmp = None
+    path = args.db
+    if len(path) == 0:
+        tmp = tempfile.mkdtemp()
+        path = os.path.join(tmp, 'synth.db')
+    db = {'path': args.db}
+    if not os.path.exists(path):
+        synthdb.make_db(path, args.scale, args.fanout, seed=args.seed,
+                        ensure_indexes=args.indexes)
+        db['synth'] = {'scale': args.scale, 'fanout': args.fanout, 'seed': args.seed}
+    db.update(describe_db(path))
+
+    rnd = random.Random(args.seed)
+    results = {}
+    results.update(bench_reads(path, args.n, rnd))
+    results.update(bench_writes(path, args.n, args.batch, rnd))
+    results.update(bench_phrases(path, args.n, rnd))
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'db': db,
+            'n': args.n,
+        },
+        'results': results,
+    }
+    if tmp is not None:
+        shutil.rmtree(tmp)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if len(args.out) > 0:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if len(args.baseline) > 0:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        slower = compare(results, baseline, args.tolerance)
+        if len(slower) > 0:
+            print('slower than baseline: %s' % ', '.join(slower))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+WordNetDbの検索スループットをスレッド数ごとに計測する
+
+python benchmarks/bench_threads.py [db/wnjpn.db] [最大スレッド数] [検索回数]
+"""
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from snark import wordnetdb
+
+
+def sample_lemmas(path, n, seed=0):
+    wn = wordnetdb.WordNetDb(path)
+    lemmas = [r[0] for r in wn.conn.execute('select lemma from word')]
+    wn.close()
+    random.seed(seed)
+    return [random.choice(lemmas) for _ in range(n)]
+
+
+def bench(wn, threads, lemmas):
+    def lookup(lemma):
+        wn.get_same_words_by_lemma(lemma)
+        return wn.get_word_info_by_lemma(lemma)
+
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        # スレッドごとの接続を作ってから計測する
+        list(ex.map(lookup, lemmas[:threads * 4]))
+        t0 = time.perf_counter()
+        list(ex.map(lookup, lemmas, chunksize=16))
+        t1 = time.perf_counter()
+    return len(lemmas) / (t1 - t0)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'db/wnjpn.db'
+    max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    n = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    lemmas = sample_lemmas(path, n)
+    print('threads\tshared[lookup/s]\tpool[lookup/s]')
+    shared = wordnetdb.WordNetDb(path)
+    pool = wordnetdb.WordNetDb(path, mode='pool')
+    threads = 1
+    while threads <= max_threads:
+        print('%d\t%.0f\t%.0f' % (threads, bench(shared, threads, lemmas),
+                                  bench(pool, threads, lemmas)))
+        threads *= 2
+    shared.close()
+    pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+python -X importtimeでsnarkのモジュールのimport時間を計測し、
+上限を超えたら終了コード1で終わる
+
+python benchmarks/check_import_time.py [モジュール名=上限ms ...]
+"""
+import os
+import subprocess
+import sys
+
+# モジュールごとのimport時間の上限(ms)
+BUDGETS = {
+    'snark.wordnetdb': 100,
+    'snark.kanadb': 50,
+}
+
+# 計測のばらつきを抑えるために複数回計測して最小値を使う
+REPEAT = 3
+
+
+def import_time(module):
+    """
+    モジュールのimport時間(累積, ms)を計測する
+    """
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    env = dict(os.environ, PYTHONPATH=root)
+    best = None
+    for _ in range(REPEAT):
+        p = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                           env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        for line in p.stderr.splitlines():
+            cols = line.split('|')
+            if len(cols) == 3 and cols[2].strip() == module:
+                t = int(cols[1]) / 1000.0
+                best = t if best is None else min(best, t)
+    return best
+
+
+def main():
+    budgets = dict(BUDGETS)
+    for arg in sys.argv[1:]:
+        (module, ms) = arg.split('=')
+        budgets[module] = float(ms)
+    failed = False
+    for (module, budget) in sorted(budgets.items()):
+        t = import_time(module)
+        ok = t <= budget
+        failed = failed or not ok
+        print('%s\t%.1fms\t(budget %.0fms)\t%s' % (module, t, budget, 'ok' if ok else 'NG'))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""
+日本語WordNet(wnjpn.db)と同じスキーマの合成DBを作る
+
+python benchmarks/synthdb.py db/synth.db [--scale 0.1] [--fanout pareto] [--seed 0]
+
+scale=1で日本語WordNet 1.1と同程度の件数になる
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from snark import wordnetdb
+
+# scale=1のときの件数 (日本語WordNet 1.1の件数に近づけている)
+SYNSETS = 117659
+JPN_WORDS = 93834
+ENG_WORDS = 148730
+
+SCHEMA = '''
+CREATE TABLE word (wordid integer primary key, lang text, lemma text, pron text, pos text);
+CREATE TABLE sense (synset text, wordid integer, lang text, rank text, lexid integer, freq integer, src text);
+CREATE TABLE synset (synset text, pos text, name text, src text);
+CREATE TABLE synset_def (synset text, lang text, def text, sid text);
+CREATE TABLE synlink (synset1 text, synset2 text, link text, src text);
+'''
+
+# 品詞の割合
+POS = [('n', 0.69), ('v', 0.12), ('a', 0.16), ('r', 0.03)]
+
+# 上位下位以外の関係
+LINKS = ['mero', 'holo', 'also', 'sim', 'attr', 'enta', 'caus', 'dmnc', 'dmtc']
+
+HIRAGANA = [chr(c) for c in range(ord('ぁ'), ord('ん') + 1)]
+KATAKANA = [chr(c) for c in range(ord('ァ'), ord('ン') + 1)]
+KANJI = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+
+
+def fanout(rnd, mean, dist, minimum=0):
+    """
+    平均meanの分布distに従う個数を1つ作る
+
+    Parameters
+    ----------
+    dist : str
+        fixed: 常にmeanを丸めた数
+        poisson: ポアソン分布
+        pareto: 平均がmeanになるパレート分布(すそが重い)
+    """
+    if dist == 'fixed':
+        n = int(round(mean))
+    elif dist == 'poisson':
+        # Knuthの方法
+        (limit, n, p) = (math.exp(-mean), 0, rnd.random())
+        while p > limit:
+            n += 1
+            p *= rnd.random()
+    elif dist == 'pareto':
+        alpha = 1.5
+        n = int(rnd.paretovariate(alpha) * mean * (alpha - 1) / alpha + 0.5)
+    else:
+        raise ValueError('unknown fanout: %s' % dist)
+    return max(n, minimum)
+
+
+def _lemmas(rnd, n, make):
+    lemmas = set()
+    while len(lemmas) < n:
+        lemmas.add(make())
+    return sorted(lemmas)
+
+
+def _jpn_lemma(rnd):
+    chars = rnd.choice([HIRAGANA, KATAKANA, KANJI, KANJI])
+    return ''.join(rnd.choice(chars) for _ in range(rnd.randint(1, 4)))
+
+
+def _eng_lemma(rnd):
+    return ''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rnd.randint(3, 10)))
+
+
+def _pick(rnd, items, dist):
+    """
+    分布に合わせて語を選ぶ, paretoなら先頭の語ほど選ばれやすい(多義語になる)
+    """
+    if dist == 'pareto':
+        i = int(len(items) * (1 - rnd.random() ** 0.5) ** 2)
+        return items[min(i, len(items) - 1)]
+    return rnd.choice(items)
+
+
+def make_db(path, scale=0.1, fanout_dist='pareto', senses_per_synset=1.6,
+            links_per_synset=0.4, branching=4, seed=0, ensure_indexes=False,
+            chains_per_synset=0.01, chain_length=8):
+    """
+    合成DBを作る
+
+    Parameters
+    ----------
+    path : str
+        作るDBファイルのパス(あれば上書き)
+    scale : float
+        件数の倍率
+    fanout_dist : str
+        概念ごとのワード数, 下位の数, 関係数の分布(fixed, poisson, pareto)
+    senses_per_synset : float
+        言語ごとの概念あたりのワード数の平均
+    links_per_synset : float
+        概念あたりの上位下位以外の関係数の平均
+    branching : int
+        fixedのときの上位下位関係の木の分岐数
+    seed : int
+        乱数の種
+    ensure_indexes : bool
+        TrueならWordNetDb.ensure_indexesでインデックスを作る
+    chains_per_synset : float
+        概念あたりのnext関係の連鎖の数
+        連鎖はadd_phraseで作るものと同じく概念名が概念IDの概念をnextでつなぎ、
+        get_synlink_nextが何段もたどる
+    chain_length : int
+        連鎖の関係の数の平均(fanout_distに従う, 最小2)
+
+    Returns
+    -------
+    テーブルごとの行数とnext関係の連鎖の数(chain)
+    """
+    rnd = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+
+    n = max(int(SYNSETS * scale), 2)
+    jpn = _lemmas(rnd, max(int(JPN_WORDS * scale), 1), lambda: _jpn_lemma(rnd))
+    eng = _lemmas(rnd, max(int(ENG_WORDS * scale), 1), lambda: _eng_lemma(rnd))
+    rnd.shuffle(jpn)
+    rnd.shuffle(eng)
+
+    pos_weights = [w for (_, w) in POS]
+    synsets = []
+    for i in range(n):
+        pos = rnd.choices([p for (p, _) in POS], pos_weights)[0]
+        synsets.append(('%08d-%s' % (i + 1, pos), pos))
+
+    words = {}
+    senses = []
+    synset_rows = []
+    defs = []
+    for (sid, pos) in synsets:
+        names = []
+        for (lang, lemmas) in (('eng', eng), ('jpn', jpn)):
+            for _ in range(fanout(rnd, senses_per_synset, fanout_dist, 1)):
+                lemma = _pick(rnd, lemmas, fanout_dist)
+                key = (lang, lemma, pos)
+                if key not in words:
+                    words[key] = len(words) + 1
+                senses.append((sid, words[key], lang, None, 0, 0, 'synth'))
+                names.append(lemma)
+        synset_rows.append((sid, pos, names[0], 'synth'))
+        defs.append((sid, 'eng', 'definition of %s' % names[0], '0'))
+        defs.append((sid, 'jpn', '%sの説明' % names[-1], '0'))
+
+    # 上位下位関係の木, paretoなら下位の多い概念ほど下位がつきやすい
+    links = []
+    attach = [0]
+    for i in range(1, n):
+        if fanout_dist == 'fixed':
+            parent = (i - 1) // branching
+        elif fanout_dist == 'pareto':
+            parent = rnd.choice(attach)
+        else:
+            parent = rnd.randrange(i)
+        attach.extend([parent, i])
+        links.append((synsets[i][0], synsets[parent][0], 'hype', 'synth'))
+        links.append((synsets[parent][0], synsets[i][0], 'hypo', 'synth'))
+    for i in range(n):
+        for _ in range(fanout(rnd, links_per_synset, fanout_dist)):
+            j = rnd.randrange(n)
+            if j != i:
+                links.append((synsets[i][0], synsets[j][0], rnd.choice(LINKS), 'synth'))
+
+    # next関係の連鎖, 概念名を概念IDにして次の概念から続けてたどれるようにする
+    chains = 0
+    for _ in range(int(n * chains_per_synset)):
+        length = fanout(rnd, chain_length, fanout_dist, 2)
+        chain = []
+        for _ in range(length + 1):
+            sid = '%08d-n' % (len(synsets) + len(chain) + 1)
+            chain.append(sid)
+            synset_rows.append((sid, 'n', sid, 'synth'))
+            defs.append((sid, 'jpn', '%sの説明' % sid, '0'))
+        synsets.extend((sid, 'n') for sid in chain)
+        for (a, b) in zip(chain, chain[1:]):
+            links.append((a, b, 'next', 'synth'))
+        chains += 1
+
+    conn.executemany('INSERT INTO word VALUES(?,?,?,?,?)',
+                     [(wid, lang, lemma, None, pos) for ((lang, lemma, pos), wid) in words.items()])
+    conn.executemany('INSERT INTO sense VALUES(?,?,?,?,?,?,?)', senses)
+    conn.executemany('INSERT INTO synset VALUES(?,?,?,?)', synset_rows)
+    conn.executemany('INSERT INTO synset_def VALUES(?,?,?,?)', defs)
+    conn.executemany('INSERT INTO synlink VALUES(?,?,?,?)', links)
+    conn.commit()
+    conn.close()
+
+    if ensure_indexes:
+        wordnetdb.WordNetDb(path, ensure_indexes=True).close()
+    return {'word': len(words), 'sense': len(senses), 'synset': len(synset_rows),
+            'synset_def': len(defs), 'synlink': len(links), 'chain': chains}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='wnjpn.dbと同じスキーマの合成DBを作る')
+    parser.add_argument('path')
+    parser.add_argument('--scale', type=float, default=0.1)
+    parser.add_argument('--fanout', default='pareto', choices=['fixed', 'poisson', 'pareto'])
+    parser.add_argument('--senses', type=float, default=1.6, help='言語ごとの概念あたりのワード数の平均')
+    parser.add_argument('--links', type=float, default=0.4, help='概念あたりの上位下位以外の関係数の平均')
+    parser.add_argument('--branching', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--indexes', action='store_true', help='インデックスを作る')
+    parser.add_argument('--chains', type=float, default=0.01, help='概念あたりのnext関係の連鎖の数')
+    parser.add_argument('--chain-length', type=int, default=8, help='連鎖の関係の数の平均')
+    args = parser.parse_args()
+    counts = make_db(args.path, args.scale, args.fanout, args.senses, args.links,
+                     args.branching, args.seed, args.indexes, args.chains, args.chain_length)
+    for (table, count) in counts.items():
+        print('%s\t%d' % (table, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Copyright 2019 hiraokusky
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# pip install git+https://github.com/hiraokusky/snark
+from snark import wordnetdb
+
+
+class AsyncWordNetDb:
+    """
+    WordNetDbのメソッドをasyncioのコルーチンとして呼び出す
+
+    wn.get_words(...)などWordNetDbの公開メソッドはすべて
+    await wn.get_words(...)として呼び出せる
+    DBアクセスはスレッドプールで行い、イベントループを止めない
+    """
+
+    def __init__(self, path, max_workers=4, max_pending=256, **kwargs):
+        """
+        Parameters
+        ----------
+        path : str
+            DBファイルのパス
+        max_workers : int
+            DBアクセスするスレッド数
+        max_pending : int
+            実行待ちと実行中の呼び出しの上限
+            これを超えた呼び出しは空くまでawaitで待つ
+        kwargs
+            WordNetDbの引数, modeのデフォルトはpool
+        """
+        kwargs.setdefault('mode', 'pool')
+        self.wn = wordnetdb.WordNetDb(path, **kwargs)
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.max_pending = max_pending
+        self._sem = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        実行中の呼び出しが終わるのを待って閉じる
+        待つ間もイベントループを止めないように、別のスレッドで閉じる
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.close)
+
+    def close(self):
+        """
+        実行中の呼び出しが終わるのを待って閉じる, イベントループの外から呼び出す
+        """
+        self.executor.shutdown(wait=True)
+        self.wn.close()
+
+    def __getattr__(self, name):
+        if name.startswith('_') or 'wn' not in self.__dict__:
+            raise AttributeError(name)
+        f = getattr(self.wn, name)
+        if not callable(f):
+            return f
+        if name.startswith('iter_'):
+            # ジェネレータはスレッドの中でリストにする
+            g = f
+            f = lambda *args, **kwargs: list(g(*args, **kwargs))
+
+        @functools.wraps(f)
+        async def method(*args, **kwargs):
+            return await self._call(functools.partial(f, *args, **kwargs))
+        return method
+
+    async def _call(self, f):
+        """
+        fをスレッドプールで実行する
+        実行待ちと実行中の数がmax_pendingを超えないように待つ
+        """
+        loop = asyncio.get_running_loop()
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_pending)
+        await self._sem.acquire()
+        try:
+            cf = self.executor.submit(f)
+        except BaseException:
+            self._sem.release()
+            raise
+        # キャンセルされても、スレッドでの実行が終わるまで枠は解放しない
+        cf.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._sem.release))
+        return await asyncio.wrap_future(cf)
+
+    async def map(self, name, args, chunk_size=64):
+        """
+        WordNetDbのメソッドをargsの各要素で呼び出し、結果をargsの順に返す
+
+        Parameters
+        ----------
+        name : str
+            メソッド名
+        args : list
+            メソッドの第1引数のリスト
+        chunk_size : int
+            1回のスレッド実行でまとめて処理する件数
+
+        Returns
+        -------
+        [結果 ...]
+        """
+        f = getattr(self.wn, name)
+        args = list(args)
+
+        def run(chunk):
+            return [f(a) for a in chunk]
+
+        chunks = [args[i:i + chunk_size] for i in range(0, len(args), chunk_size)]
+        results = await asyncio.gather(
+            *[self._call(functools.partial(run, c)) for c in chunks])
+        return [r for rs in results for r in rs]
+
+    async def get_same_words_by_lemmas(self, lemmas, chunk_size=64):
+        """
+        単語リストの各単語と同じ概念を持つ同義語をまとめて取得する
+
+        Returns
+        -------
+        [get_same_words_by_lemmaの結果 ...]
+            lemmasの順
+        """
+        return await self.map('get_same_words_by_lemma', lemmas, chunk_size)
@@ -0,0 +1,77 @@
+"""
+Copyright 2019 hiraokusky
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# 動詞の原型の最後の文字ごとの活用語尾
+# 先に並んでいるものほど優先する
+VERB_ENDS = {
+    'う': ['わ', 'い', 'う', 'え', 'お', 'った', 'って'],  # 会う
+    'く': ['か', 'き', 'く', 'け', 'こ', 'いた', 'いて'],  # 書く
+    'す': ['さ', 'し', 'す', 'せ', 'そ', 'した', 'して'],  # 指す
+    'つ': ['た', 'ち', 'つ', 'て', 'と', 'った', 'って'],  # 勝つ
+    'ぬ': ['な', 'に', 'ぬ', 'ね', 'の', 'んだ', 'んで'],  # 死ぬ
+    'ぶ': ['ば', 'び', 'ぶ', 'べ', 'ぼ', 'んだ', 'んで'],  # 尊ぶ
+    'む': ['ま', 'み', 'む', 'め', 'も', 'んだ', 'んで'],  # 噛む
+    'る': ['ら', 'り', 'る', 'れ', 'ろ', 'よ', 'った', 'って', 'た', 'て', ''],  # 得る→得て, 探る→探って
+}
+
+# 形容詞の原型の最後の文字ごとの活用語尾
+ADJ_ENDS = {
+    'い': ['い', 'な', 'かった', 'く', 'そう', 'くて', 'くない', 'けれ'],  # 楽しい
+}
+
+
+def expand(word, ends):
+    """
+    原型を活用形に展開する
+
+    Parameters
+    ----------
+    word : str
+        原型
+    ends : dict
+        VERB_ENDSかADJ_ENDS
+
+    Returns
+    -------
+    [(活用形, 活用語尾) ...]
+        優先する順, 活用しない語なら[]
+    """
+    if len(word) == 0 or word[-1] not in ends:
+        return []
+    stem = word[:-1]
+    return [(stem + e, e) for e in ends[word[-1]]]
+
+
+def expand_verb(word):
+    return expand(word, VERB_ENDS)
+
+
+def expand_adj(word):
+    return expand(word, ADJ_ENDS)
+
+
+def match(s, word, ends):
+    """
+    元の文字列の先頭に一致する活用形を取得する
+
+    Returns
+    -------
+    先頭に一致する活用形のうち最も優先するもの, なければNone
+    """
+    for (form, _) in expand(word, ends):
+        if s.startswith(form):
+            return form
+    return None
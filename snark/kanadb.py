@@ -22,6 +22,23 @@ class KanaDb:
 
     def __init__(self):
         self.table = str.maketrans(self.kana_romaji)
+        # 片仮名(ァ-ヶ)は平仮名(ぁ-ゖ)の0x60後ろにある
+        self.hira_table = {c: c - 0x60 for c in range(ord('ァ'), ord('ヶ') + 1)}
+
+    def to_hiragana(self, s):
+        """
+        片仮名を平仮名に変換する
+
+        Parameters
+        ----------
+        s : string
+            片仮名を含む文字列
+
+        Returns
+        -------
+        片仮名部分を平仮名に変換した文字列
+        """
+        return s.translate(self.hira_table)
 
     def to_romaji(self, s):
         """
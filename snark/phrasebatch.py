@@ -0,0 +1,154 @@
+"""
+Copyright 2019 hiraokusky
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import argparse
+import collections
+import gc
+import itertools
+import json
+import multiprocessing
+import sys
+
+from snark import phrasenetdb
+
+# ワーカープロセスで使うPhraseNetDb
+# forkではfork前に親プロセスで設定したものをコピーオンライトで共有する
+_db = None
+
+
+def _init_worker(db_path, dict_path):
+    """
+    forkできないとき(spawn)にワーカープロセスごとに1回だけ辞書をロードする
+    """
+    global _db
+    _db = phrasenetdb.PhraseNetDb(db_path)
+    _db.load_file(dict_path)
+    _db._get_trie()
+
+
+def _tokenize_chunk(sentences):
+    return [_db.tokenize(s) for s in sentences]
+
+
+def _chunks(sentences, chunksize):
+    it = iter(sentences)
+    while True:
+        chunk = list(itertools.islice(it, chunksize))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def tokenize_all(db, sentences, processes=None, chunksize=1000, db_path='', dict_path=''):
+    """
+    文の列をプロセスプールでtokenizeする
+
+    フレーズ辞書はタスクごとに送らない
+    forkが使えれば、トライを作ってからforkして子プロセスとコピーオンライトで共有する
+    forkが使えなければ、db_pathとdict_pathから子プロセスごとに1回だけロードする
+
+    Parameters
+    ----------
+    db : PhraseNetDb
+        辞書をロードしたPhraseNetDb
+    sentences : iterable
+        文の列, 先頭から順に必要な分だけ読む
+    processes : int
+        プロセス数, Noneならコア数, 1ならプロセスを作らずに実行する
+    chunksize : int
+        1つのタスクでtokenizeする文の数
+    db_path : str
+        forkが使えないときに子プロセスで開くWordNetDbのパス, ''なら開かない
+    dict_path : str
+        forkが使えないときに子プロセスでロードするフレーズ辞書のパス
+
+    Returns
+    -------
+    文ごとのtokenizeの結果を入力と同じ順に返すジェネレータ
+    """
+    global _db
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes <= 1:
+        for s in sentences:
+            yield db.tokenize(s)
+        return
+
+    # この呼び出しでfreezeしたときだけunfreezeする
+    frozen = False
+    if 'fork' in multiprocessing.get_all_start_methods():
+        _db = db
+        # 子プロセスで参照カウントを書き換えてもページがコピーされないように、
+        # トライを作ってからGCの対象外にしておく
+        db._get_trie()
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            # 呼び出し元がすでにfreezeしていれば、その分までunfreezeしないように戻さない
+            frozen = gc.get_freeze_count() == 0
+            gc.freeze()
+        pool = multiprocessing.get_context('fork').Pool(processes)
+    else:
+        if len(dict_path) == 0:
+            raise ValueError('dict_path is required without fork')
+        pool = multiprocessing.Pool(processes, _init_worker, (db_path, dict_path))
+
+    # 処理中のタスクをプロセス数の2倍までにして、入力を読みすぎないようにする
+    pending = collections.deque()
+    try:
+        for chunk in _chunks(sentences, chunksize):
+            pending.append(pool.apply_async(_tokenize_chunk, (chunk,)))
+            if len(pending) >= processes * 2:
+                for tokens in pending.popleft().get():
+                    yield tokens
+        while len(pending) > 0:
+            for tokens in pending.popleft().get():
+                yield tokens
+    finally:
+        pool.terminate()
+        pool.join()
+        if frozen:
+            gc.unfreeze()
+        _db = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='テキストファイルの各行をフレーズに分割し、1行1つのJSONで出力する')
+    parser.add_argument('input', nargs='?', default='-', help='入力ファイル(UTF-8), -なら標準入力')
+    parser.add_argument('--dict', required=True, help='フレーズ辞書(phrases.csv)のパス')
+    parser.add_argument('--db', default='', help='WordNetDbのパス(tokenizeでは使わないので通常は不要)')
+    parser.add_argument('-o', '--output', default='-', help='出力ファイル, -なら標準出力')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='プロセス数(既定はコア数)')
+    parser.add_argument('--chunksize', type=int, default=1000, help='1つのタスクで処理する行数')
+    args = parser.parse_args()
+
+    db = phrasenetdb.PhraseNetDb(args.db)
+    db.load_file(args.dict)
+
+    fin = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    fout = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        lines = (line.rstrip('\r\n') for line in fin)
+        (lines, texts) = itertools.tee(lines)
+        for tokens in tokenize_all(db, lines, args.processes, args.chunksize, args.db, args.dict):
+            fout.write(json.dumps({'text': next(texts), 'tokens': tokens}, ensure_ascii=False) + '\n')
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -13,16 +13,42 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-import pandas as pd
-import numpy as np
-import re
-import json
 import sys
 import os
 
 # pip install git+https://github.com/hiraokusky/snark
 from snark import wordnetdb, kanadb
 from snark import fu
+from snark import conjugation
+
+class PhraseTrie:
+    """
+    キーの文字をたどるトライ, 文字列の先頭に一致するキーの値を取得する
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, key, value):
+        node = self.root
+        for c in key:
+            node = node.setdefault(c, {})
+        # 値はキーNoneに持つ
+        node.setdefault(None, []).append(value)
+
+    def prefixes(self, s, start=0):
+        """
+        s[start:]の先頭に一致するすべてのキーの値を、キーの短い順に取得する
+        """
+        node = self.root
+        values = list(node.get(None, []))
+        for k in range(start, len(s)):
+            node = node.get(s[k])
+            if node is None:
+                break
+            values.extend(node.get(None, []))
+        return values
+
 
 class PhraseNetDb:
 
@@ -30,15 +56,34 @@ class PhraseNetDb:
     kn = kanadb.KanaDb()
 
     # 外部辞書
-    startdict = pd.DataFrame()
+    startdict = None
+
+    # tokenizeで辞書にない文字1つにつけるコスト(フレーズ1つは1)
+    UNKNOWN_COST = 10
 
-    def __init__(self, path):
-        self.wn = wordnetdb.WordNetDb(path)
+    # startdictから作ったトライと、作ったときのstartdict
+    _trie = None
+    _trie_src = None
+
+    def __init__(self, path=''):
+        """
+        Parameters
+        ----------
+        path : str
+            WordNetDbのパス, ''ならWordNetDbを開かない(tokenizeなどフレーズ辞書だけを使うとき)
+        """
+        # pandasはPhraseNetDbを使うときだけimportする
+        import pandas as pd
+        self.startdict = pd.DataFrame()
+        self.wn = None
+        if len(path) > 0:
+            self.wn = wordnetdb.WordNetDb(path)
 
     def load_file(self, path):
         """
         フレーズ辞書をファイルからロードする
         """
+        import pandas as pd
         self.startdict = pd.read_csv(path, header=None)
         self.startdict = self.startdict.fillna('')
 
@@ -46,6 +91,7 @@ class PhraseNetDb:
         """
         フレーズ辞書をWordNetDbからロードする
         """
+        import pandas as pd
         wn = wordnetdb.WordNetDb(path)
 
         d = wn.get_synset_def_all(
@@ -68,6 +114,10 @@ class PhraseNetDb:
     def save_db(self, path):
         """
         フレーズ辞書をWordNetDnに保存する
+
+        Returns
+        -------
+        {'inserted': 追加した件数, 'duplicate': 既にあって追加しなかった件数}
         """
         wn = wordnetdb.WordNetDb(path)
 
@@ -81,13 +131,54 @@ class PhraseNetDb:
                 if len(dict_pron) > 0:
                     dict_word = dict_pron + ' ' + dict_word
                 data.append((dict_pos, 'jpn', dict_word, 'pn'))
-        wn.insert_synset_def_all(data)
+        return wn.insert_synset_def_all(data)
 
-    def _match_phrase_type(self, t, word):
+    def _get_trie(self):
+        """
+        フレーズ辞書のトライを取得する, startdictが置き換わっていれば作り直す
+
+        キーは表記で、動詞vと形容詞aは原型を活用形に展開したそれぞれの表記
+        値は(辞書の行番号, 活用語尾の優先順, 品詞, 原型, 直前の発音, 概念, 表記, 活用語尾)
+        """
+        if self._trie is None or self._trie_src is not self.startdict:
+            trie = PhraseTrie()
+            for (i, p) in enumerate(self.startdict.values):
+                (dict_pos, dict_word) = (p[0], p[1])
+                if len(dict_pos) > 0 and dict_pos[0] == 'v':
+                    forms = conjugation.expand_verb(dict_word)
+                elif len(dict_pos) > 0 and dict_pos[0] == 'a':
+                    forms = conjugation.expand_adj(dict_word)
+                else:
+                    forms = [(dict_word, '')]
+                for (rank, (form, end)) in enumerate(forms):
+                    trie.add(form, (i, rank, dict_pos, dict_word, p[2], p[3], form, end))
+            self._trie = trie
+            self._trie_src = self.startdict
+        return self._trie
+
+    def _prefix_entries(self, s, start=0):
+        """
+        表記がs[start:]の先頭に一致する辞書の行を辞書の順に取得する
+        1つの行の複数の活用形が一致するときは、活用語尾の優先順が先のものだけを返す
+        """
+        best = {}
+        for v in self._get_trie().prefixes(s, start):
+            b = best.get(v[0])
+            if b is None or v[1] < b[1]:
+                best[v[0]] = v
+        return [best[i] for i in sorted(best)]
+
+    def _match_phrase_type(self, t, word, start=0):
+        if t not in ('v', 'a'):
+            # 表記がword[start:]の先頭に一致するものだけを調べる
+            for (_, _, dict_pos, dict_word, _, _, _, _) in self._get_trie().prefixes(word, start):
+                if len(dict_pos) > 0 and dict_pos[0] == t and len(dict_word) > 0:
+                    return True
+            return False
         for p in self.startdict.values:
             dict_pos = p[0]
             dict_word = p[1]
-            if len(dict_pos) > 0 and dict_pos[0] == t and len(dict_word) > 0 and word.startswith(dict_word):
+            if len(dict_pos) > 0 and dict_pos[0] == t and len(dict_word) > 0 and word.startswith(dict_word, start):
                 return True
         return False
 
@@ -125,13 +216,24 @@ class PhraseNetDb:
             残ったもので候補リストを再構成する
         """
         pre = self.kn.to_romaji(pre)
+        return self._phrases_at(s, 0, pre, len(pre), pret)
+
+    def _phrases_at(self, s, start, pre, pre_end, pret):
+        """
+        s[start:]に一致するフレーズを取得する(get_phrasesの本体)
+
+        s[start:]やpre[:pre_end]を切り出さずに調べるので、文の途中の位置でも
+        文の長さによらない時間で済む
+
+        Parameters
+        ----------
+        pre: ローマ字に変換した直前の文字列
+        pre_end: preのうち直前の文字として使う長さ
+        """
         l = 0
         matches = []
-        for p in self.startdict.values:
-            dict_pos = p[0]
-            dict_word = p[1]
-            dict_synset = p[3]
-            dict_pron = p[2]
+        # 表記(動詞と形容詞は活用形)がsの先頭に一致するものだけを辞書の順に調べる
+        for (_, _, dict_pos, dict_word, dict_pron, dict_synset, form, _) in self._prefix_entries(s, start):
             q = [dict_pos, dict_word, dict_synset, dict_pron]
             # print(dict_pos, dict_word, dict_synset, dict_pron)
 
@@ -161,38 +263,30 @@ class PhraseNetDb:
 
             if len(dict_pos) > 0:
                 if dict_pos[0] == 'v':
-                    # 動詞の活用と一致するものを選択
-                    w = self.get_verb_ends(s, dict_word)
-                    if w != None:
-                        dict_word = w
-                        q[1] = w
-                        # 次の文字が平仮名でなければvではない
-                        if len(s) > len(w) and not self.kn.is_hiragana(s[len(w):][0]):
-                            continue
-                    else:
+                    # 動詞の活用と一致するもの(トライで選択済み)
+                    dict_word = form
+                    q[1] = form
+                    # 次の文字が平仮名でなければvではない
+                    if len(s) > start + len(form) and not self.kn.is_hiragana(s[start + len(form)]):
                         continue
 
                 if dict_pos[0] == 'a':
-                    # 形容詞の活用と一致するものを選択
-                    w = self.get_adj_ends(s, dict_word)
-                    if w != None:
-                        dict_word = w
-                        q[1] = w
-                    else:
-                        continue
+                    # 形容詞の活用と一致するもの(トライで選択済み)
+                    dict_word = form
+                    q[1] = form
 
-            if len(dict_word) > 0 and s.startswith(dict_word):
+            if len(dict_word) > 0 and s.startswith(dict_word, start):
                 match = False
 
                 # 接続パターンがない場合
-                if len(pre) == 0 or len(dict_pos) <= 1:
+                if pre_end == 0 or len(dict_pos) <= 1:
                     match = True
                 # 接続パターンがある場合はパターンに一致する場合のみ一致
-                elif pre.endswith(dict_pron):
+                elif pre.endswith(dict_pron, 0, pre_end):
                     match = True
 
                 # # 文終わりf品詞の場合、直後はe記号でないといけない
-                if dict_pos[0] == 'f' and not self._match_phrase_type('e', s[len(dict_word):]):
+                if dict_pos[0] == 'f' and not self._match_phrase_type('e', s, start + len(dict_word)):
                     match = False
 
                 if match:
@@ -205,66 +299,111 @@ class PhraseNetDb:
 
         return matches
 
+    def tokenize(self, s):
+        """
+        文をフレーズの列に分割する
+
+        Parameters
+        ----------
+        s: 文
+
+        Returns
+        -------
+        [[品詞, フレーズ, 概念, 直前の発音] ...]
+            get_phrasesと同じ形式のトークンのリスト
+            辞書にない文字の並びは['', 文字列, '', '']の1トークンにする
+        """
+        return self.tokenize_nbest(s, 1)[0][1]
+
+    def tokenize_nbest(self, s, n=1):
+        """
+        文をフレーズの列に分割し、コストの小さい順にn通りを取得する
+
+        文の各位置でget_phrasesと同じ規則(直前の品詞, 直前の発音, 文終わりfの直後の記号e)で
+        一致するフレーズを辺とするラティスを作り、(位置, 直前の品詞)ごとに
+        コストの小さいn通りだけを残して進める(ビタビアルゴリズム)
+        各位置の状態の数は品詞の種類で抑えられるので、時間は文の長さに比例する
+
+        コストはフレーズ1つにつき1, 辞書にない文字1つにつきUNKNOWN_COST
+
+        Parameters
+        ----------
+        s: 文
+        n: 取得する分割の数
+
+        Returns
+        -------
+        [[コスト, [[品詞, フレーズ, 概念, 直前の発音] ...]] ...]
+            コストの小さい順, 同じコストなら先に見つけた順
+        """
+        # 直前の文字列はローマ字にして文全体で1回だけ変換しておく
+        # 1文字が1文字以上に変換されるので、位置iまでの長さを持てばよい
+        pre = self.kn.to_romaji(s)
+        pre_end = [0]
+        for c in s:
+            pre_end.append(pre_end[-1] + len(self.kn.to_romaji(c)))
+
+        # best[i][直前の品詞] = [(コスト, 直前の状態, 直前の状態での順位, トークン, 未知語か) ...]
+        best = [{} for _ in range(len(s) + 1)]
+        best[0][''] = [(0, None, 0, None, False)]
+        for i in range(len(s)):
+            for (pret, paths) in best[i].items():
+                edges = [(1, q, False) for q in self._phrases_at(s, i, pre, pre_end[i], pret)]
+                edges.append((self.UNKNOWN_COST, ['', s[i], '', ''], True))
+                for (cost, q, unknown) in edges:
+                    states = best[i + len(q[1])]
+                    pos = q[0]
+                    kept = states.setdefault(pos, [])
+                    for (rank, path) in enumerate(paths):
+                        self._keep_nbest(kept, (path[0] + cost, (i, pret), rank, q, unknown), n)
+
+        ends = []
+        for (pret, paths) in best[len(s)].items():
+            for (rank, path) in enumerate(paths):
+                ends.append((path[0], (len(s), pret), rank))
+        ends.sort(key=lambda e: e[0])
+
+        results = []
+        for (cost, state, rank) in ends[:n]:
+            tokens = []
+            while True:
+                (i, pret) = state
+                path = best[i][pret][rank]
+                if path[1] is None:
+                    break
+                q = path[3]
+                if path[4] and len(tokens) > 0 and tokens[-1][1]:
+                    # 辞書にない文字の並びはまとめる
+                    tokens[-1][0][1] = q[1] + tokens[-1][0][1]
+                else:
+                    tokens.append([list(q), path[4]])
+                (state, rank) = (path[1], path[2])
+            results.append([cost, [t[0] for t in reversed(tokens)]])
+        return results
+
+    def _keep_nbest(self, kept, path, n):
+        """
+        コストの小さい順に並んだkeptにpathを加え、n個を超えた分を捨てる
+        """
+        if len(kept) == n and kept[-1][0] <= path[0]:
+            return
+        k = len(kept)
+        while k > 0 and kept[k - 1][0] > path[0]:
+            k -= 1
+        kept.insert(k, path)
+        del kept[n:]
+
     def get_verb_ends(self, s, word):
         """
         get_verb_ends(元の文字列, 動詞原型) -> 元の文字列の動詞活用形部分
         """
-        c = word[len(word) - 1]
-        w = word[:len(word) - 1]
-        if c == 'う':  # 会う
-            d = ['わ', 'い', 'う', 'え', 'お', 'った', 'って']
-            for e in d:
-                if s.startswith(w + e):
-                    return w + e
-        if c == 'く':  # 書く
-            d = ['か', 'き', 'く', 'け', 'こ', 'いた', 'いて']
-            for e in d:
-                if s.startswith(w + e):
-                    return w + e
-        if c == 'す':  # 指す
-            d = ['さ', 'し', 'す', 'せ', 'そ', 'した', 'して']
-            for e in d:
-                if s.startswith(w + e):
-                    return w + e
-        if c == 'つ':  # 勝つ
-            d = ['た', 'ち', 'つ', 'て', 'と', 'った', 'って']
-            for e in d:
-                if s.startswith(w + e):
-                    return w + e
-        if c == 'ぬ':  # 死ぬ
-            d = ['な', 'に', 'ぬ', 'ね', 'の', 'んだ', 'んで']
-            for e in d:
-                if s.startswith(w + e):
-                    return w + e
-        if c == 'ぶ':  # 尊ぶ
-            d = ['ば', 'び', 'ぶ', 'べ', 'ぼ', 'んだ', 'んで']
-            for e in d:
-                if s.startswith(w + e):
-                    return w + e
-        if c == 'む':  # 噛む
-            d = ['ま', 'み', 'む', 'め', 'も', 'んだ', 'んで']
-            for e in d:
-                if s.startswith(w + e):
-                    return w + e
-        if c == 'る':  # 得る→得て, 探る→探って
-            d = ['ら', 'り', 'る', 'れ', 'ろ', 'よ', 'った', 'って', 'た', 'て', '']
-            for e in d:
-                if s.startswith(w + e):
-                    return w + e
-        return None
+        return conjugation.match(s, word, conjugation.VERB_ENDS)
 
     def get_adj_ends(self, s, word):
         """
         get_adj_ends(元の文字列, 形容詞原型) -> 元の文字列の形容詞活用形部分
         """
-        c = word[len(word) - 1]
-        w = word[:len(word) - 1]
-        if c == 'い':  # 楽しい
-            d = ['い', 'な', 'かった', 'く', 'そう', 'くて', 'くない', 'けれ']
-            for e in d:
-                if s.startswith(w + e):
-                    return w + e
-        return None
+        return conjugation.match(s, word, conjugation.ADJ_ENDS)
 
     def add_context(self, tokens, context):
         """
@@ -302,6 +441,9 @@ class PhraseNetDb:
         """
         類義語リストを作る
         """
+        if self.wn is None:
+            # WordNetDbを開いていなければ単語そのものだけ
+            return word
         return fu.array2_to_str(self.wn.get_same_words_by_lemma(word), 3)
 
     def match_schema(self, schema, tokens):
@@ -0,0 +1,203 @@
+"""
+Copyright 2019 hiraokusky
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import codecs
+import json
+import re
+import time
+
+# 文の終わりの文字, 改行は文の終わりとして捨てる
+_END = re.compile(r'[。！？!?]|\r?\n')
+
+
+def read_text(source, bufsize=65536):
+    """
+    UTF-8のテキストを少しずつ読む
+
+    Parameters
+    ----------
+    source : str or file
+        ファイルのパスか、テキストかバイナリで開いたファイル
+    bufsize : int
+        1回に読む大きさ
+
+    Returns
+    -------
+    読んだ文字列を順に返すジェネレータ
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield from read_text(f, bufsize)
+        return
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = source.read(bufsize)
+        if len(data) == 0:
+            break
+        if isinstance(data, bytes):
+            # 文字の途中で切れたバイトは次に読んだものとつなげてデコードする
+            data = decoder.decode(data)
+        yield data
+    tail = decoder.decode(b'', final=True)
+    if len(tail) > 0:
+        yield tail
+
+
+def split_sentences(chunks, max_len=10000):
+    """
+    文字列の列を文に分ける
+
+    Parameters
+    ----------
+    chunks : iterable
+        read_textが返す文字列の列
+    max_len : int
+        文の終わりがないまま続くときに区切る長さ
+
+    Returns
+    -------
+    前後の空白を除いた空でない文を順に返すジェネレータ
+    文の終わりの文字は文に含め、改行は含めない
+    """
+    rest = ''
+    for chunk in chunks:
+        rest += chunk
+        start = 0
+        for m in _END.finditer(rest):
+            s = rest[start:m.start()] if m.group().endswith('\n') else rest[start:m.end()]
+            start = m.end()
+            s = s.strip()
+            if len(s) > 0:
+                yield s
+        rest = rest[start:]
+        # \r\nの途中で切れたときは次の文字列とつなげる
+        while len(rest) > max_len and not rest.endswith('\r'):
+            s = rest[:max_len].strip()
+            rest = rest[max_len:]
+            if len(s) > 0:
+                yield s
+    rest = rest.strip()
+    if len(rest) > 0:
+        yield rest
+
+
+class PhrasePipeline:
+    """
+    テキストを読みながら文に分け、PhraseNetDbでtokenizeとadd_contextをして
+    1文ごとにJSON Linesの1行を返す
+
+    読んでいる途中の文字列と処理中の1文しか持たないので、入力の大きさによらず
+    使うメモリは一定になる
+    """
+
+    def __init__(self, db, context=True, report=None, report_every=10000):
+        """
+        Parameters
+        ----------
+        db : PhraseNetDb
+            辞書をロードしたPhraseNetDb
+        context : bool
+            Trueならadd_contextでコンテキストを作る
+        report : function
+            report_every文ごとと最後にcounters()のdictを渡して呼び出す
+            (最後の報告はreport_every文ごとの報告の後に処理した文がなければしない)
+        report_every : int
+            reportを呼び出す間隔の文の数
+        """
+        self.db = db
+        self.context = context
+        self.report = report
+        self.report_every = report_every
+        self.reset()
+
+    def reset(self):
+        self.chars = 0
+        self.sentences = 0
+        self.tokens = 0
+        self.elapsed = 0.0
+
+    def counters(self):
+        """
+        処理した量と速さ
+
+        Returns
+        -------
+        {'chars': 文字数, 'sentences': 文の数, 'tokens': トークン数, 'time': 秒,
+         'chars_per_sec', 'sentences_per_sec'}
+            timeは読み込みを含み、結果を受け取った呼び出し元で過ごした時間は含まない
+        """
+        t = self.elapsed
+        return {'chars': self.chars, 'sentences': self.sentences, 'tokens': self.tokens,
+                'time': t,
+                'chars_per_sec': self.chars / t if t > 0 else 0.0,
+                'sentences_per_sec': self.sentences / t if t > 0 else 0.0}
+
+    def process(self, s):
+        """
+        1文を処理する
+
+        Returns
+        -------
+        {'text': 文, 'tokens': [[品詞, フレーズ, 概念, 直前の発音] ...], 'context': [...]}
+        """
+        tokens = self.db.tokenize(s)
+        record = {'text': s, 'tokens': tokens}
+        if self.context:
+            context = []
+            if len(tokens) > 0:
+                # add_contextのトークンは[フレーズ, 品詞, 概念]の順
+                self.db.add_context([[t[1], t[0], t[2]] for t in tokens], context)
+            record['context'] = context
+        return record
+
+    def records(self, source, bufsize=65536):
+        """
+        sourceを読みながら1文ごとにprocessの結果を返すジェネレータ
+
+        Parameters
+        ----------
+        source : str or file
+            ファイルのパスか、テキストかバイナリで開いたファイル
+        """
+        # 呼び出し元で過ごした時間を含めないように、yieldの間は計らない
+        t0 = time.perf_counter()
+        # 最後に報告したときの文の数
+        reported = None
+        try:
+            for s in split_sentences(read_text(source, bufsize)):
+                record = self.process(s)
+                self.chars += len(s)
+                self.sentences += 1
+                self.tokens += len(record['tokens'])
+                self.elapsed += time.perf_counter() - t0
+                t0 = None
+                if self.report is not None and self.sentences % self.report_every == 0:
+                    self.report(self.counters())
+                    reported = self.sentences
+                yield record
+                t0 = time.perf_counter()
+        finally:
+            if t0 is not None:
+                self.elapsed += time.perf_counter() - t0
+            # 直前の報告から何も処理していなければ同じ内容を2回報告しない
+            if self.report is not None and reported != self.sentences:
+                self.report(self.counters())
+
+    def run(self, source, bufsize=65536):
+        """
+        sourceを読みながら1文ごとにJSON Linesの1行(改行つき)を返すジェネレータ
+        """
+        for record in self.records(source, bufsize):
+            yield json.dumps(record, ensure_ascii=False) + '\n'
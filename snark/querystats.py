@@ -0,0 +1,285 @@
+"""
+Copyright 2019 hiraokusky
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import collections
+import functools
+import threading
+import time
+
+
+def _bucket(seconds):
+    """
+    レイテンシのヒストグラムの区間, 2のべき乗の上限(マイクロ秒)
+    """
+    return 1 << int(seconds * 1e6).bit_length()
+
+
+class QueryStats:
+    """
+    WordNetDbのメソッドの呼び出し回数, SQLの実行回数, 取得した行数, レイテンシを集計する
+
+    SQLは実行したときに一番内側で呼び出し中のメソッドに集計する
+    """
+
+    def __init__(self, trace=False, callback=None, trace_limit=10000):
+        """
+        Parameters
+        ----------
+        trace : bool
+            TrueならSQLごとに文, パラメータ, 時間, 行数を記録する
+        callback : function
+            メソッドの呼び出しとSQLの実行が終わるたびにイベントのdictを渡して呼び出す
+            {'type': 'call', 'method', 'caller', 'time'}
+            {'type': 'sql', 'method', 'sql', 'params', 'time', 'rows'}
+            SQLのrowsとtimeは実行した時点の値で、その後の取得分は含まない
+        trace_limit : int
+            記録するSQLの件数の上限(古いものから捨てる)
+        """
+        self.trace = trace
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._trace = collections.deque(maxlen=trace_limit)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.methods = {}
+            self.queries = {}
+            self._trace.clear()
+
+    def _method(self, name):
+        m = self.methods.get(name)
+        if m is None:
+            m = {'calls': 0, 'time': 0.0, 'sql': 0, 'rows': 0,
+                 'histogram': {}, 'callers': {}}
+            self.methods[name] = m
+        return m
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = []
+            self._local.stack = stack
+        return stack
+
+    def current(self):
+        """
+        このスレッドで一番内側で呼び出し中のメソッド名, なければ''
+        """
+        stack = self._stack()
+        return stack[-1] if len(stack) > 0 else ''
+
+    def wrap_method(self, name, f):
+        """
+        メソッドの呼び出しを集計する関数を作る
+        iter_で始まるメソッドは返したジェネレータを最後まで読むか閉じるまでを1回とする
+        """
+        if name.startswith('iter_'):
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                return self._iterate(name, f(*args, **kwargs))
+            return wrapper
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            stack = self._stack()
+            caller = stack[-1] if len(stack) > 0 else ''
+            stack.append(name)
+            t0 = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                stack.pop()
+                self._record_call(name, caller, time.perf_counter() - t0)
+        return wrapper
+
+    def _iterate(self, name, it):
+        stack = self._stack()
+        caller = stack[-1] if len(stack) > 0 else ''
+        elapsed = 0.0
+        try:
+            while True:
+                # 次の行を取り出す間だけ呼び出し中にする
+                stack.append(name)
+                t0 = time.perf_counter()
+                try:
+                    row = next(it)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - t0
+                    stack.pop()
+                yield row
+        finally:
+            self._record_call(name, caller, elapsed)
+
+    def _record_call(self, name, caller, elapsed):
+        with self._lock:
+            m = self._method(name)
+            m['calls'] += 1
+            m['time'] += elapsed
+            b = _bucket(elapsed)
+            m['histogram'][b] = m['histogram'].get(b, 0) + 1
+            if len(caller) > 0:
+                m['callers'][caller] = m['callers'].get(caller, 0) + 1
+        if self.callback is not None:
+            self.callback({'type': 'call', 'method': name, 'caller': caller, 'time': elapsed})
+
+    def _record_sql(self, sql, params, elapsed):
+        """
+        SQLの実行を集計し、行数と時間を後から足すための記録を返す
+        """
+        name = self.current()
+        record = {'method': name, 'sql': sql, 'params': params, 'time': elapsed, 'rows': 0}
+        with self._lock:
+            self._method(name)['sql'] += 1
+            q = self.queries.get(sql)
+            if q is None:
+                q = {'count': 0, 'time': 0.0, 'rows': 0}
+                self.queries[sql] = q
+            q['count'] += 1
+            q['time'] += elapsed
+            if self.trace:
+                self._trace.append(record)
+        if self.callback is not None:
+            self.callback(dict(record, type='sql'))
+        return record
+
+    def _record_rows(self, record, rows, elapsed):
+        """
+        SQLの結果の取得を集計する
+        """
+        with self._lock:
+            record['rows'] += rows
+            record['time'] += elapsed
+            self._method(record['method'])['rows'] += rows
+            q = self.queries[record['sql']]
+            q['rows'] += rows
+            q['time'] += elapsed
+
+    def snapshot(self):
+        """
+        集計結果のコピー
+
+        Returns
+        -------
+        {'methods': {メソッド名: {'calls', 'time', 'sql', 'rows', 'histogram', 'callers'}},
+         'queries': {SQL: {'count', 'time', 'rows'}},
+         'sql': SQLの実行回数, 'rows': 取得した行数,
+         'trace': [{'method', 'sql', 'params', 'time', 'rows'} ...]}
+            メソッド名''はメソッドの外で実行したSQL
+            histogramは{上限(マイクロ秒): 回数}, callersは{呼び出し元のメソッド名: 回数}
+        """
+        with self._lock:
+            methods = {}
+            for (name, m) in self.methods.items():
+                m = dict(m)
+                m['histogram'] = dict(sorted(m['histogram'].items()))
+                m['callers'] = dict(m['callers'])
+                methods[name] = m
+            return {
+                'methods': methods,
+                'queries': {sql: dict(q) for (sql, q) in self.queries.items()},
+                'sql': sum(m['sql'] for m in methods.values()),
+                'rows': sum(m['rows'] for m in methods.values()),
+                'trace': [dict(r) for r in self._trace],
+            }
+
+    def connection(self, conn):
+        return _Connection(conn, self)
+
+
+class _Connection:
+    """
+    SQLの実行を集計するsqlite3.Connectionのラッパー
+    """
+
+    def __init__(self, conn, stats):
+        self._conn = conn
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._conn.__exit__(exc_type, exc_val, exc_tb)
+
+    def cursor(self):
+        return _Cursor(self._conn.cursor(), self._stats)
+
+    def execute(self, sql, params=()):
+        return _Cursor(self._conn.cursor(), self._stats).execute(sql, params)
+
+    def executemany(self, sql, params):
+        return _Cursor(self._conn.cursor(), self._stats).executemany(sql, params)
+
+
+class _Cursor:
+    """
+    SQLの実行と結果の取得を集計するsqlite3.Cursorのラッパー
+    """
+
+    def __init__(self, cur, stats):
+        self._cur = cur
+        self._stats = stats
+        self._record = None
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def execute(self, sql, params=()):
+        t0 = time.perf_counter()
+        self._cur.execute(sql, params)
+        self._record = self._stats._record_sql(sql, params, time.perf_counter() - t0)
+        return self
+
+    def executemany(self, sql, params):
+        params = list(params)
+        t0 = time.perf_counter()
+        self._cur.executemany(sql, params)
+        # 一括実行のパラメータは件数だけ記録する
+        self._record = self._stats._record_sql(sql, len(params), time.perf_counter() - t0)
+        return self
+
+    def _fetch(self, f, *args):
+        t0 = time.perf_counter()
+        rows = f(*args)
+        if self._record is not None:
+            n = len(rows) if isinstance(rows, list) else int(rows is not None)
+            self._stats._record_rows(self._record, n, time.perf_counter() - t0)
+        return rows
+
+    def fetchone(self):
+        return self._fetch(self._cur.fetchone)
+
+    def fetchall(self):
+        return self._fetch(self._cur.fetchall)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._fetch(self._cur.fetchmany)
+        return self._fetch(self._cur.fetchmany, size)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
@@ -0,0 +1,296 @@
+"""
+Copyright 2019 hiraokusky
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import array
+import bisect
+import fnmatch
+import re
+import unicodedata
+
+from snark import kanadb
+
+# どの文字よりも後ろに並ぶ文字 (前方一致の範囲の終わりに使う)
+_LAST = '\U0010ffff'
+
+
+def _deletes(s, n):
+    """
+    sから0文字からn文字までを削除した文字列の集合
+    """
+    out = {s}
+    cur = {s}
+    for _ in range(n):
+        cur = {c[:i] + c[i + 1:] for c in cur for i in range(len(c))}
+        out |= cur
+    return out
+
+
+class SearchIndex:
+    """
+    word.lemmaとword.pronから作る単語の検索用の索引
+
+    見出し語をソートした配列で持ち、前方一致は二分探索で求める
+    あいまい検索は、見出し語の先頭FUZZY_PREFIX文字から削除した文字列の表(削除の近傍)を引いて
+    候補を絞り、候補だけ編集距離を計算する
+    FUZZY_EDITSより多い編集を許すときは、ソート順に共通の接頭辞の編集距離の計算を使い回して
+    (ソート済み配列を暗黙のトライとしてたどって)求める
+    """
+
+    # 削除の近傍の表に入れる見出し語の先頭の文字数
+    FUZZY_PREFIX = 6
+    # 削除の近傍の表を使う編集回数の上限
+    FUZZY_EDITS = 2
+
+    def __init__(self, wn, kana=False):
+        """
+        Parameters
+        ----------
+        wn : WordNetDb
+            索引を作るDB
+        kana : bool
+            Trueなら全角半角をそろえ、小文字にし、片仮名を平仮名にした見出し語で索引を作る
+        """
+        self.wn = wn
+        self.kana = kana
+        self.kanadb = kanadb.KanaDb() if kana else None
+        entries = set()
+        for (wordid, lemma, pron) in wn.conn.execute('/* bulk */ SELECT wordid, lemma, pron FROM word'):
+            for key in (lemma, pron):
+                if key:
+                    entries.add((self.normalize(key), wordid))
+        entries = sorted(entries)
+        self.keys = [e[0] for e in entries]
+        self.wordids = [e[1] for e in entries]
+        # 先頭の文字ごとの見出し語の範囲 (あいまい検索の最初の分岐)
+        self._children = []
+        i = 0
+        while i < len(self.keys):
+            if self.keys[i] == '':
+                i += 1
+                continue
+            c = self.keys[i][0]
+            end = bisect.bisect_left(self.keys, c + _LAST, i)
+            self._children.append((c, i, end))
+            i = end
+        # 削除する文字数ごとの削除の近傍の表, 最初に使うときに作る
+        self._tables = {}
+
+    def normalize(self, s):
+        """
+        見出し語と検索語をそろえる
+        """
+        if not self.kana:
+            return s
+        return self.kanadb.to_hiragana(unicodedata.normalize('NFKC', s).lower())
+
+    def _range(self, prefix, lo=0, hi=None):
+        """
+        keys[lo:hi]のうちprefixで始まる見出し語の添字の範囲
+        """
+        if hi is None:
+            hi = len(self.keys)
+        lo = bisect.bisect_left(self.keys, prefix, lo, hi)
+        hi = bisect.bisect_left(self.keys, prefix + _LAST, lo, hi)
+        return (lo, hi)
+
+    def _take(self, idx, limit):
+        """
+        添字のリストを重複のないワードIDのリストにする
+        """
+        wordids = []
+        seen = set()
+        for i in idx:
+            w = self.wordids[i]
+            if w not in seen:
+                seen.add(w)
+                wordids.append(w)
+                if len(wordids) == limit:
+                    break
+        return wordids
+
+    def prefix(self, prefix, limit):
+        """
+        prefixで始まる見出し語のワードIDを見出し語の順に取得する
+        """
+        (lo, hi) = self._range(self.normalize(prefix))
+        return self._take(range(lo, hi), limit)
+
+    def wildcard(self, pattern, limit):
+        """
+        *(0文字以上)と?(1文字)を含むパターンに合う見出し語のワードIDを取得する
+        """
+        pattern = self.normalize(pattern)
+        m = re.compile(fnmatch.translate(pattern)).match
+        # 最初のワイルドカードまでの前方一致で候補を絞る
+        literal = re.split(r'[*?\[]', pattern, 1)[0]
+        (lo, hi) = self._range(literal)
+        return self._take((i for i in range(lo, hi) if m(self.keys[i])), limit)
+
+    def fuzzy(self, lemma, max_edits, limit):
+        """
+        lemmaとの編集距離がmax_edits以下の見出し語のワードIDを近い順に取得する
+
+        Returns
+        -------
+        [(ワードID, 編集距離) ...]
+        """
+        q = self.normalize(lemma)
+        if max_edits > self.FUZZY_EDITS:
+            found = []
+            self._fuzzy(q, max_edits, '', list(range(len(q) + 1)), 0, len(self.keys), found)
+            return self._ranked(found, limit)
+        for n in range(max(max_edits, 0) + 1):
+            found = []
+            if n == 0:
+                lo = bisect.bisect_left(self.keys, q)
+                found = [(0, i) for i in range(lo, bisect.bisect_right(self.keys, q, lo))]
+            else:
+                self._fuzzy_table(q, n, found)
+            result = self._ranked(found, limit)
+            # 距離n以下でlimit件そろえば、それより遠い見出し語は順位に入らないので調べない
+            if limit > 0 and len(result) >= limit:
+                break
+        return result
+
+    def _ranked(self, found, limit):
+        """
+        [(編集距離, 添字) ...]を近い順, 見出し語の順に並べて[(ワードID, 編集距離) ...]にする
+        """
+        found.sort()
+        wordids = self._take((i for (_, i) in found), limit)
+        dist = {}
+        for (d, i) in found:
+            dist.setdefault(self.wordids[i], d)
+        return [(w, dist[w]) for w in wordids]
+
+    def _group(self, i):
+        """
+        keys[i]から始まる表の1項目の見出し語の範囲と、表に入れる文字列
+        FUZZY_PREFIX文字より短い見出し語は同じ見出し語, それ以外は先頭FUZZY_PREFIX文字が同じ見出し語をまとめる
+        """
+        k = self.keys[i]
+        if len(k) < self.FUZZY_PREFIX:
+            return (bisect.bisect_right(self.keys, k, i), k)
+        head = k[:self.FUZZY_PREFIX]
+        return (bisect.bisect_left(self.keys, head + _LAST, i), head)
+
+    def _table(self, n):
+        """
+        見出し語の先頭FUZZY_PREFIX文字からn文字までを削除した文字列の表
+
+        Returns
+        -------
+        (削除した文字列のハッシュの下位32ビット << 32 | 項目の最初の添字)のソート済み配列
+        """
+        table = self._tables.get(n)
+        if table is None:
+            items = []
+            i = 0
+            while i < len(self.keys):
+                (end, head) = self._group(i)
+                for v in _deletes(head, n):
+                    items.append((hash(v) & 0xffffffff) << 32 | i)
+                i = end
+            items.sort()
+            table = array.array('Q', items)
+            self._tables[n] = table
+        return table
+
+    def _fuzzy_table(self, q, n, found):
+        """
+        qとの編集距離がn以下の見出し語を削除の近傍の表で求める
+
+        編集距離がn以下の見出し語の先頭FUZZY_PREFIX文字は、qの先頭FUZZY_PREFIX±n文字のどれかとの
+        編集距離がn以下なので、両方からn文字までを削除すると同じ文字列にできる
+        qの先頭の削除の近傍で表を引いて候補の項目を集め、編集距離を計算して確かめる
+        """
+        table = self._table(n)
+        variants = _deletes(q, n)
+        for j in range(max(self.FUZZY_PREFIX - n, 0), min(self.FUZZY_PREFIX + n + 1, len(q))):
+            # 途中までのqは先頭FUZZY_PREFIX文字の項目だけに使うので、n文字より多く短くなるものは引かない
+            variants |= set(v for v in _deletes(q[:j], n) if len(v) >= self.FUZZY_PREFIX - n)
+        seen = set()
+        for v in variants:
+            h = hash(v) & 0xffffffff
+            j = bisect.bisect_left(table, h << 32)
+            while j < len(table) and table[j] >> 32 == h:
+                i = table[j] & 0xffffffff
+                j += 1
+                if i in seen:
+                    continue
+                seen.add(i)
+                (end, head) = self._group(i)
+                # 項目の見出し語で共通の先頭の分は1回だけ計算し、残りはトライとしてたどる
+                row = self._advance(q, list(range(len(q) + 1)), head, n)
+                if row is not None:
+                    self._fuzzy(q, n, head, row, i, end, found)
+
+    def _advance(self, q, row, s, n):
+        """
+        rowにsの文字を順に続けたときの編集距離, どの接頭辞とも距離がnを超えればNone
+        """
+        for c in s:
+            row = self._next_row(q, row, c)
+            if min(row) > n:
+                return None
+        return row
+
+    def _fuzzy(self, q, max_edits, prefix, row, lo, hi, found):
+        """
+        keys[lo:hi](すべてprefixで始まる)を暗黙のトライとして深さ優先でたどる
+        rowはprefixとqの各接頭辞の編集距離
+        """
+        keys = self.keys
+        d = len(prefix)
+        while lo < hi and len(keys[lo]) == d:
+            if row[-1] <= max_edits:
+                found.append((row[-1], lo))
+            lo += 1
+        if lo == hi:
+            return
+        if min(row) < max_edits:
+            # どの文字を続けても距離を超えないので、すべての子をたどる
+            if d == 0:
+                children = self._children
+            else:
+                children = []
+                i = lo
+                while i < hi:
+                    c = keys[i][d]
+                    end = bisect.bisect_left(keys, prefix + c + _LAST, i, hi)
+                    children.append((c, i, end))
+                    i = end
+        else:
+            # 距離がちょうど上限なら、qの文字と一致する子だけをたどる
+            children = []
+            for c in sorted(set(q[k] for k in range(len(q)) if row[k] == max_edits)):
+                (i, end) = self._range(prefix + c, lo, hi)
+                if i < end:
+                    children.append((c, i, end))
+        # qにない文字を続けたときの距離はどの文字でも同じ
+        other = self._next_row(q, row, None)
+        for (c, i, end) in children:
+            nrow = self._next_row(q, row, c) if c in q else other
+            if min(nrow) <= max_edits:
+                self._fuzzy(q, max_edits, prefix + c, nrow, i, end, found)
+
+    def _next_row(self, q, row, c):
+        """
+        prefixにcを続けたときのqの各接頭辞との編集距離
+        """
+        nrow = [row[0] + 1]
+        for (k, qc) in enumerate(q):
+            nrow.append(min(nrow[k] + 1, row[k + 1] + 1, row[k] + (qc != c)))
+        return nrow
@@ -0,0 +1,308 @@
+"""
+Copyright 2019 hiraokusky
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import threading
+
+import numpy as np
+
+
+class SimilarityIndex:
+    """
+    推移閉包テーブル(snark_closure)から作る意味的類似度の計算用の配列
+
+    概念ごとに自分自身を含む上位の整数IDと距離をCSR配列で持ち、
+    共通の上位を配列演算で求めて類似度を計算する
+    """
+
+    def __init__(self, wn):
+        self.wn = wn
+        synsets = [r[0] for r in wn.conn.execute(
+            '/* bulk */ SELECT synset FROM synset UNION SELECT ancestor FROM snark_closure'
+            ' UNION SELECT descendant FROM snark_closure')]
+        self.synsets = synsets
+        self.index = {s: i for (i, s) in enumerate(synsets)}
+        n = len(synsets)
+
+        rows = wn.conn.execute(
+            '/* bulk */ SELECT ancestor, descendant, depth FROM snark_closure').fetchall()
+        anc = np.array([self.index[r[0]] for r in rows] + list(range(n)), dtype=np.int64)
+        desc = np.array([self.index[r[1]] for r in rows] + list(range(n)), dtype=np.int64)
+        dist = np.array([r[2] for r in rows] + [0] * n, dtype=np.int32)
+
+        # 下位の整数IDの順に並べる
+        order = np.argsort(desc, kind='stable')
+        self.anc = anc[order]
+        self.dist = dist[order]
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(desc, minlength=n), out=self.offsets[1:])
+
+        # 概念の深さは最も遠い上位(根)からの距離+1
+        self.depth = np.ones(n, dtype=np.int32)
+        np.maximum.at(self.depth, desc[order], self.dist + 1)
+        self.max_depth = int(self.depth.max()) if n > 0 else 1
+
+        # _scoresの作業用の配列はスレッドごとに持つ
+        self._local = threading.local()
+
+    def _buf(self):
+        """
+        このスレッドで使う概念ごとのbからの距離の配列(使わない要素は-1)
+        """
+        buf = getattr(self._local, 'buf', None)
+        if buf is None:
+            buf = np.full(len(self.synsets), -1, dtype=np.int32)
+            self._local.buf = buf
+        return buf
+
+    def _expand_items(self, items):
+        """
+        概念IDもしくは単語を、整数IDのCSR配列にする
+
+        Returns
+        -------
+        (開始位置の配列(要素数+1), 整数IDの配列)
+        """
+        lemmas = set()
+        keys = [getattr(item, 'synset', item) for item in items]
+        for key in keys:
+            if key not in self.index:
+                lemmas.add(key)
+        senses = {}
+        rows = self.wn._select_in(
+            'SELECT w.lemma, s.synset FROM word w JOIN sense s ON s.wordid=w.wordid'
+            ' WHERE w.lemma IN ({0}) ORDER BY s.rowid', lemmas)
+        for r in rows:
+            if r[1] in self.index:
+                senses.setdefault(r[0], []).append(self.index[r[1]])
+        ids = []
+        counts = []
+        for key in keys:
+            if key in self.index:
+                ids.append(self.index[key])
+                counts.append(1)
+            else:
+                l = senses.get(key, [])
+                ids.extend(l)
+                counts.append(len(l))
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return (offsets, np.array(ids, dtype=np.int64))
+
+    def _scores(self, a, b):
+        """
+        bを固定して、aの各概念との最短距離とWu-Palmer類似度を計算する
+        Wu-Palmer類似度は 2 * 最も深い共通の上位の深さ / (aの深さ + bの深さ)
+
+        Returns
+        -------
+        (最短距離の配列(共通の上位がなければ-1), Wu-Palmer類似度の配列)
+        """
+        buf = self._buf()
+        s = slice(self.offsets[b], self.offsets[b + 1])
+        buf[self.anc[s]] = self.dist[s]
+
+        starts = self.offsets[a]
+        counts = self.offsets[a + 1] - starts
+        total = int(counts.sum())
+        idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        owner = np.repeat(np.arange(len(a)), counts)
+        c = self.anc[idx]
+        db = buf[c]
+        ok = db >= 0
+        owner = owner[ok]
+        c = c[ok]
+        da = self.dist[idx][ok]
+        db = db[ok]
+
+        buf[self.anc[s]] = -1
+
+        # ownerは昇順なので、ownerごとの区間で最小と最大を求める
+        path = np.full(len(a), -1, dtype=np.int64)
+        wup = np.zeros(len(a))
+        if len(owner) == 0:
+            return (path, wup)
+        seg = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        path[owner[seg]] = np.minimum.reduceat(da + db, seg)
+        # 最も深い共通の上位の深さ
+        lcs = np.maximum.reduceat(self.depth[c], seg)
+        wup[owner[seg]] = 2.0 * lcs / (self.depth[a[owner[seg]]] + self.depth[b])
+        return (path, wup)
+
+    def similarity(self, pairs, measure='path'):
+        """
+        概念もしくは単語のペアの類似度をまとめて計算する
+
+        Parameters
+        ----------
+        pairs : list
+            [(概念IDもしくは単語, 概念IDもしくは単語) ...]
+            単語の場合は単語の概念の組み合わせのうち最も高い類似度にする
+        measure : str
+            path: 1 / (最短距離 + 1)
+            wup: Wu-Palmer類似度 2 * 最も深い共通の上位の深さ / (深さ + 深さ)
+            lch: Leacock-Chodorow類似度 -log((最短距離 + 1) / (2 * 最大の深さ))
+
+        Returns
+        -------
+        ペアごとの類似度の配列, 共通の上位がなければ0
+        """
+        pairs = list(pairs)
+        lefts = self._expand_items([p[0] for p in pairs])
+        rights = self._expand_items([p[1] for p in pairs])
+        n = np.arange(len(pairs))
+        return self._similarity(lefts, rights, n, n, measure)
+
+    def similarity_matrix(self, lefts, rights, measure='path'):
+        """
+        lefts×rightsのすべての組み合わせの類似度をまとめて計算する
+
+        Returns
+        -------
+        len(lefts)×len(rights)の類似度の配列
+        """
+        if measure not in ('path', 'wup', 'lch'):
+            raise ValueError('unknown measure: %s' % measure)
+        (lo, lids) = self._expand_items(list(lefts))
+        (ro, rids) = self._expand_items(list(rights))
+        result = np.zeros((len(lo) - 1, len(ro) - 1))
+        if len(lids) == 0 or len(rids) == 0:
+            return result
+        ua = np.unique(lids)
+        ub = np.unique(rids)
+        table = self._dense_scores(ua, ub, measure)
+        t = table[np.searchsorted(ua, lids)][:, np.searchsorted(ub, rids)]
+
+        # 単語の概念の組み合わせのうち最も高い類似度にする
+        ln = np.flatnonzero(lo[1:] > lo[:-1])
+        rn = np.flatnonzero(ro[1:] > ro[:-1])
+        t = np.maximum.reduceat(t, lo[ln], axis=0)
+        t = np.maximum.reduceat(t, ro[rn], axis=1)
+        result[np.ix_(ln, rn)] = t
+        return result
+
+    def _measure(self, path, wup, measure):
+        """
+        最短距離とWu-Palmer類似度から指定の類似度を求める
+        """
+        if measure == 'wup':
+            return wup
+        # 共通の上位がないもの(-1)は0のままにして、見つかったものだけ計算する
+        found = path >= 0
+        result = np.zeros(np.shape(path))
+        if measure == 'path':
+            result[found] = 1.0 / (path[found] + 1)
+        else:
+            result[found] = -np.log((path[found] + 1) / (2.0 * self.max_depth))
+        return result
+
+    def _sparse_scores(self, pa, pb, ua, ub, measure):
+        """
+        概念のペアごとの類似度を、概念の少ない側を固定して計算する
+        """
+        # 種類の少ない側を固定する側にする
+        if len(ua) < len(ub):
+            (pa, pb) = (pb, pa)
+        scores = np.zeros(len(pa))
+        order = np.argsort(pb, kind='stable')
+        (keys, starts) = np.unique(pb[order], return_index=True)
+        ends = list(starts[1:]) + [len(order)]
+        for (b, st, en) in zip(keys, starts, ends):
+            sel = order[st:en]
+            (path, wup) = self._scores(pa[sel], b)
+            scores[sel] = self._measure(path, wup, measure)
+        return scores
+
+    def _dense_scores(self, ua, ub, measure, block=1 << 24):
+        """
+        ua×ubのすべての概念の組み合わせの類似度の表を計算する
+        """
+        big = np.iinfo(np.int32).max // 4
+        # ubの上位をまとめた表 m[上位, ubの添字] = 距離, 最後の行は番兵
+        starts = self.offsets[ub]
+        counts = self.offsets[ub + 1] - starts
+        idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+        col = np.repeat(np.arange(len(ub)), counts)
+        (cu, row) = np.unique(self.anc[idx], return_inverse=True)
+        m = np.full((len(cu) + 1, len(ub)), big, dtype=np.int32)
+        m[row, col] = self.dist[idx]
+        pos = np.full(len(self.synsets), len(cu), dtype=np.int64)
+        pos[cu] = np.arange(len(cu))
+
+        # uaの上位のうちubの上位でもあるものを行ごとに詰めた表, 空きは番兵にする
+        starts = self.offsets[ua]
+        counts = self.offsets[ua + 1] - starts
+        idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+        owner = np.repeat(np.arange(len(ua)), counts)
+        ok = pos[self.anc[idx]] < len(cu)
+        idx = idx[ok]
+        owner = owner[ok]
+        counts = np.bincount(owner, minlength=len(ua))
+        width = max(1, int(counts.max()) if len(ua) > 0 else 1)
+        slot = np.arange(len(idx)) - np.repeat(np.cumsum(counts) - counts, counts)
+        k = np.full((len(ua), width), len(cu), dtype=np.int64)
+        da = np.zeros((len(ua), width), dtype=np.int32)
+        dc = np.zeros((len(ua), width), dtype=np.int32)
+        k[owner, slot] = pos[self.anc[idx]]
+        da[owner, slot] = self.dist[idx]
+        dc[owner, slot] = self.depth[self.anc[idx]]
+
+        path = np.full((len(ua), len(ub)), -1, dtype=np.int64)
+        wup = np.zeros((len(ua), len(ub)), dtype=np.float64)
+        # メモリを抑えるためにuaの区間ごとに計算する
+        step = max(1, block // (width * max(1, len(ub))))
+        for i in range(0, len(ua), step):
+            v = da[i:i + step, :, None] + m[k[i:i + step]]
+            p = v.min(axis=1)
+            p[p >= big] = -1
+            path[i:i + step] = p
+            if measure == 'wup':
+                # 最も深い共通の上位の深さ
+                lcs = np.where(v < big, dc[i:i + step, :, None], 0).max(axis=1)
+                wup[i:i + step] = 2.0 * lcs / (
+                    self.depth[ua[i:i + step], None] + self.depth[ub][None, :])
+        return self._measure(path, wup, measure)
+
+    def _similarity(self, lefts, rights, ia, ib, measure):
+        """
+        lefts[ia[i]]とrights[ib[i]]の類似度を計算する
+        """
+        if measure not in ('path', 'wup', 'lch'):
+            raise ValueError('unknown measure: %s' % measure)
+        (lo, lids) = lefts
+        (ro, rids) = rights
+
+        # ペアを概念の組み合わせに展開する
+        lc = (lo[1:] - lo[:-1])[ia]
+        rc = (ro[1:] - ro[:-1])[ib]
+        m = lc * rc
+        pid = np.repeat(np.arange(len(ia)), m)
+        k = np.arange(int(m.sum())) - np.repeat(np.cumsum(m) - m, m)
+        pa = lids[lo[ia][pid] + k // rc[pid]]
+        pb = rids[ro[ib][pid] + k % rc[pid]]
+        ua = np.unique(pa)
+        ub = np.unique(pb)
+        if len(ua) * len(ub) <= 4 * len(pa):
+            # 組み合わせが密なら、一意な概念同士の類似度の表から引く
+            table = self._dense_scores(ua, ub, measure)
+            scores = table[np.searchsorted(ua, pa), np.searchsorted(ub, pb)]
+        else:
+            scores = self._sparse_scores(pa, pb, ua, ub, measure)
+
+        # pidは昇順なので、ペアごとの区間で最大を求める
+        result = np.zeros(len(ia))
+        if len(pid) > 0:
+            seg = np.flatnonzero(np.r_[True, pid[1:] != pid[:-1]])
+            result[pid[seg]] = np.maximum.reduceat(scores, seg)
+        return result
@@ -0,0 +1,184 @@
+"""
+Copyright 2019 hiraokusky
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import numpy as np
+
+
+def export_csr(wn, path):
+    """
+    synsetとsynlinkを整数IDのCSR隣接配列にして.npyファイルに保存する
+
+    Parameters
+    ----------
+    wn : WordNetDb
+        書き出すDB
+    path : str
+        保存先ディレクトリ
+
+    Notes
+    -----
+    synsets.npy: 概念ID(整数IDの順, ソート済み)
+    offsets.npy: 整数IDごとの関係の開始位置(概念数+1)
+    targets.npy: 関係先の整数ID
+    links.npy: 関係の種類コード
+    link_names.npy: 種類コードごとの関係名
+
+    Returns
+    -------
+    (概念数, 関係数)
+    """
+    synsets = [r[0] for r in wn.conn.execute(
+        '/* bulk */ SELECT synset FROM synset UNION SELECT synset1 FROM synlink'
+        ' UNION SELECT synset2 FROM synlink ORDER BY 1')]
+    synsets = np.array(synsets, dtype=str)
+    rows = wn.conn.execute('/* bulk */ SELECT synset1, synset2, link FROM synlink').fetchall()
+    if len(rows) > 0:
+        (src, dst, link) = [np.array(c, dtype=str) for c in zip(*rows)]
+    else:
+        (src, dst, link) = [np.array([], dtype=str)] * 3
+    (link_names, link_codes) = np.unique(link, return_inverse=True)
+
+    # 関係元の整数IDの順に並べてCSRにする
+    src = np.searchsorted(synsets, src)
+    dst = np.searchsorted(synsets, dst)
+    order = np.argsort(src, kind='stable')
+    counts = np.bincount(src, minlength=len(synsets))
+    offsets = np.zeros(len(synsets) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'synsets.npy'), synsets)
+    np.save(os.path.join(path, 'offsets.npy'), offsets)
+    np.save(os.path.join(path, 'targets.npy'), dst[order].astype(np.int32))
+    np.save(os.path.join(path, 'links.npy'), link_codes[order].astype(np.int16))
+    np.save(os.path.join(path, 'link_names.npy'), link_names)
+    return (len(synsets), len(rows))
+
+
+class SynLinkGraph:
+    """
+    export_csrで保存した関係グラフをmmapで開いて、配列演算でたどる
+    """
+
+    def __init__(self, path):
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode='r')
+        self.synsets = load('synsets.npy')
+        self.offsets = load('offsets.npy')
+        self.targets = load('targets.npy')
+        self.links = load('links.npy')
+        self.link_names = list(np.load(os.path.join(path, 'link_names.npy')))
+
+    def ids(self, synsets):
+        """
+        概念IDを整数IDにする, ないものは-1
+        """
+        synsets = np.asarray(synsets, dtype=str)
+        if len(self.synsets) == 0:
+            return np.full(synsets.shape, -1, dtype=np.int64)
+        idx = np.searchsorted(self.synsets, synsets)
+        idx = np.minimum(idx, len(self.synsets) - 1)
+        return np.where(self.synsets[idx] == synsets, idx, -1)
+
+    def names(self, ids):
+        """
+        整数IDを概念IDにする
+        """
+        return self.synsets[np.asarray(ids)]
+
+    def _link_mask(self, links):
+        if links is None or len(links) == 0:
+            return None
+        codes = [self.link_names.index(l) for l in links if l in self.link_names]
+        return np.isin(np.arange(len(self.link_names)), codes)
+
+    def _expand(self, frontier, mask):
+        """
+        frontierの全ノードの関係先を配列で取得する
+        """
+        starts = self.offsets[frontier]
+        counts = self.offsets[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        # 各ノードの関係の範囲[starts, starts+counts)をつないだ添字を作る
+        base = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        idx = base + np.arange(total)
+        if mask is not None:
+            idx = idx[mask[self.links[idx]]]
+        return np.asarray(self.targets[idx], dtype=np.int64)
+
+    def bfs(self, seeds, max_depth=0, links=None):
+        """
+        複数の概念から幅優先で関係をたどる
+
+        Parameters
+        ----------
+        seeds : list
+            起点の概念ID
+        max_depth : int
+            たどる深さの上限(0なら無制限)
+        links : list
+            たどる関係(Noneなら全て)
+
+        Returns
+        -------
+        整数IDごとの起点からの深さの配列, たどれないものは-1
+        """
+        mask = self._link_mask(links)
+        dist = np.full(len(self.synsets), -1, dtype=np.int32)
+        frontier = self.ids(seeds)
+        frontier = np.unique(frontier[frontier >= 0])
+        dist[frontier] = 0
+        depth = 0
+        while len(frontier) > 0 and (max_depth == 0 or depth < max_depth):
+            depth += 1
+            nxt = self._expand(frontier, mask)
+            nxt = np.unique(nxt[dist[nxt] < 0])
+            dist[nxt] = depth
+            frontier = nxt
+        return dist
+
+    def k_hop(self, seeds, k, links=None):
+        """
+        複数の概念からk段以内でたどれる概念をすべて取得する
+
+        Parameters
+        ----------
+        k : int
+            たどる段数, 0なら起点のうちグラフにある概念だけ
+
+        Returns
+        -------
+        [概念ID ...]
+        """
+        if k < 0:
+            raise ValueError('k must be 0 or more: %d' % k)
+        if k == 0:
+            # bfsのmax_depth=0は無制限なので、起点だけを返す
+            idx = self.ids(seeds)
+            return self.names(np.unique(idx[idx >= 0]))
+        dist = self.bfs(seeds, k, links)
+        return self.names(np.nonzero(dist >= 0)[0])
+
+    def reachable(self, src, dst, max_depth=0, links=None):
+        """
+        概念srcから概念dstへたどれるか判定する
+        """
+        d = self.ids([dst])[0]
+        if d < 0:
+            return False
+        return bool(self.bfs([src], max_depth, links)[d] >= 0)
@@ -13,10 +13,6 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-import pandas as pd
-import numpy as np
-import re
-import json
 import sys,os
 
 # pip install git+https://github.com/hiraokusky/snark
@@ -41,6 +37,8 @@ class SynNetDb:
         self.v = 'v' in opts
 
     def load_file(self, path):
+        # pandasは使うときだけimportする
+        import pandas as pd
         self.startdict = pd.read_csv(path)
         self.startdict = self.startdict.fillna('')
 
@@ -107,6 +105,7 @@ class SynNetDb:
         リンクを追加する
         同じデータがあれば追加しない
         """
+        import pandas as pd
         d = self.startdict
         res = d[(d['synset1'] == synset1) & (d['link'] == link) & (d['synset2'] == synset2) ]
         if len(res) == 0:
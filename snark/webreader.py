@@ -16,15 +16,10 @@ limitations under the License.
 import re
 import urllib.parse
 
+# beautifulsoup4, selenium, rdflibは使うときだけimportする
 # pip install beautifulsoup4
-from bs4 import BeautifulSoup
-
 # pip install selenium
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-
 # pip install rdflib
-import rdflib
 
 class WebReader:
     """
@@ -35,11 +30,13 @@ class WebReader:
     # @see https://selenium-python.readthedocs.io/api.html#module-selenium.webdriver.chrome.webdriver
     driver = None
 
-    rdf_graph = rdflib.Graph()
+    rdf_graph = None
 
     cache_path = ''
 
     def __init__(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
         options = Options()
         options.set_headless(True)
         self.driver = webdriver.Chrome(chrome_options=options)
@@ -62,6 +59,7 @@ class WebReader:
             # urlをencodeしてファイルに保存する
             return
 
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, "html.parser")
         return soup
 
@@ -69,5 +67,9 @@ class WebReader:
         """
         RDFを取得する
         """
+        if self.rdf_graph is None:
+            import rdflib
+            # グラフはすべてのWebReaderで共有する
+            WebReader.rdf_graph = rdflib.Graph()
         self.rdf_graph.load(url)
         return self.rdf_graph
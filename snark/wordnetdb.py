@@ -14,10 +14,13 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 import sqlite3
-import time
-import random
-import networkx as nx
-import matplotlib
+import os
+import functools
+import threading
+import itertools
+import json
+import re
+from collections import OrderedDict
 
 
 class Word:
@@ -87,51 +90,585 @@ class SynLink:
         self.link = link
 
 
+class LruCache:
+    """
+    件数上限つきのLRUキャッシュ
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        キャッシュから取得する, なければNone
+        """
+        with self.lock:
+            v = self.data.get(key)
+            if v is None:
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return v
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def evict(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self.data), 'maxsize': self.maxsize}
+
+
+def _writer(f):
+    """
+    書き込みメソッドを書き込み用の接続で排他して実行する
+    DBから作った類似度の計算用の配列と検索用の索引は書き込みで作り直す
+    """
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock:
+            self._local.writing = getattr(self._local, 'writing', 0) + 1
+            try:
+                return f(self, *args, **kwargs)
+            finally:
+                self._local.writing -= 1
+                self._similarity = None
+                self._search = None
+    return wrapper
+
+
+# explain_queriesで1つにまとめるIN句のプレースホルダの並び
+_IN_LIST = re.compile(r'IN \(\?(?:, \?)+\)')
+
+# explain_queriesでNULLを渡す名前つきのパラメータ
+_NAMED_PARAM = re.compile(r"(?<![\w:]):(\w+)")
+
+# explain_queriesで調べるSQL
+_EXPLAINABLE = re.compile(r'\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+
+# explain_queriesで実行計画のSCANの対象をテーブル名にするための、FROM/JOINのテーブルと別名
+_TABLE_ALIAS = re.compile(
+    r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?'
+    r'(?!(?:ON|WHERE|JOIN|LEFT|INNER|CROSS|ORDER|GROUP|LIMIT|UNION|USING)\b)(\w+))?',
+    re.IGNORECASE)
+
+# 全件を読み書きするのが目的のSQLの先頭につける印
+# (推移閉包や索引を作るSQLなど, explain_queriesで全件走査として報告しない)
+BULK = '/* bulk */ '
+
+
+class ReadOnlyError(Exception):
+    """
+    読み取り専用モードのWordNetDbに書き込もうとした
+    """
+    pass
+
+
+class NoClosureError(Exception):
+    """
+    推移閉包テーブルを使うメソッドを、build_closureで作る前に呼び出した
+    """
+    pass
+
+
 class WordNetDb:
-    def __init__(self, path):
-        self.conn = sqlite3.connect(path, check_same_thread=False)
+    # 検索で利用するインデックス (テーブル, カラム)
+    INDEXES = [
+        ('word', ('lemma', 'lang', 'pos')),
+        ('sense', ('wordid', 'synset')),
+        ('sense', ('synset', 'wordid')),
+        ('synset', ('synset',)),
+        ('synset', ('name',)),
+        ('synlink', ('synset1', 'link', 'synset2')),
+        ('synlink', ('synset2',)),
+        ('synset_def', ('synset', 'lang', 'def')),
+        ('synset_def', ('def', 'lang')),
+    ]
+
+    # 開くときのモード
+    MODES = ('rw', 'memory', 'ro', 'pool')
+
+    def __init__(self, path, ensure_indexes=False, mode='rw', mmap_size=1 << 30,
+                 cache_size=0):
+        """
+        Parameters
+        ----------
+        path : str
+            DBファイルのパス
+        ensure_indexes : bool
+            Trueなら開くときにインデックスを作成する
+        mode : str
+            rw: 読み書き(デフォルト)
+            memory: DB全体をメモリにコピーして読み取り専用で使う
+            ro: 読み取り専用かつ変更されないものとしてmmapで開く
+            pool: WALモードで開き、読み取りはスレッドごとの接続、
+                  書き込みは1つの書き込み用の接続で排他して行う
+        mmap_size : int
+            roモードのmmapサイズ
+        cache_size : int
+            0より大きければget_synset, get_word_by_idの結果をテーブルごとに
+            この件数までキャッシュする
+            キャッシュしたオブジェクトは呼び出し元で共有されるので変更しないこと
+        """
+        if mode not in self.MODES:
+            raise ValueError('unknown mode: %s' % mode)
+        self.mode = mode
+        self.path = path
+        self._closure = None
+        self._similarity = None
+        self._search = None
+        self._stats = None
+        self._json = None
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._readers = []
+        self.cache = None
+        if cache_size > 0:
+            self.cache = {'synset': LruCache(cache_size),
+                          'word': LruCache(cache_size)}
+        if mode == 'memory':
+            # 存在しないパスで空のDBファイルを作らないように読み取り専用で開く
+            src = sqlite3.connect(self._ro_uri(path, ''), uri=True)
+            try:
+                self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+                src.backup(self._conn)
+            finally:
+                src.close()
+        elif mode == 'ro':
+            self._conn = sqlite3.connect(self._ro_uri(path, '&immutable=1'),
+                                         uri=True, check_same_thread=False)
+            self._conn.execute('PRAGMA mmap_size=%d' % mmap_size)
+        elif mode == 'rw':
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+        elif mode == 'pool':
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        if ensure_indexes:
+            self.ensure_indexes()
+
+    def _ro_uri(self, path, options):
+        from urllib.request import pathname2url
+        return 'file:%s?mode=ro%s' % (pathname2url(os.path.abspath(path)), options)
+
+    @property
+    def conn(self):
+        """
+        このスレッドで使う接続
+        poolモードでは書き込みメソッドの中なら書き込み用の接続、
+        それ以外ならスレッドごとの読み取り用の接続
+        """
+        if self.mode != 'pool' or getattr(self._local, 'writing', 0) > 0:
+            conn = self._conn
+        else:
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute('PRAGMA query_only=1')
+                self._local.conn = conn
+                with self._write_lock:
+                    self._readers.append(conn)
+        if self._stats is not None:
+            return self._stats.connection(conn)
+        return conn
+
+    def close(self):
+        """
+        すべての接続を閉じる
+        """
+        # 開くのに失敗したときは__del__から接続がないまま呼ばれる
+        if getattr(self, '_conn', None) is None:
+            return
+        with self._write_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+            self._conn.close()
+
+    def _check_writable(self):
+        if self.mode not in ('rw', 'pool'):
+            raise ReadOnlyError(
+                'WordNetDb is opened in %s mode and cannot be written' % self.mode)
+
+    def cache_info(self):
+        """
+        テーブルごとのキャッシュのヒット数, ミス数, 件数を取得する
+
+        Returns
+        -------
+        {テーブル名: {'hits', 'misses', 'size', 'maxsize'} ...}
+            キャッシュしていなければ{}
+        """
+        if self.cache is None:
+            return {}
+        return {k: v.info() for (k, v) in self.cache.items()}
+
+    def clear_cache(self, table=''):
+        """
+        キャッシュを消す, tableを指定するとそのテーブルだけ消す
+        """
+        if self.cache is None:
+            return
+        for (k, v) in self.cache.items():
+            if len(table) == 0 or k == table:
+                v.clear()
+
+    def _evict_cache(self, table, key):
+        if self.cache is not None:
+            self.cache[table].evict(str(key))
+
+    # 計測しないメソッド
+    STATS_EXCLUDE = ('close', 'cache_info', 'clear_cache',
+                     'enable_stats', 'disable_stats', 'reset_stats', 'stats')
+
+    def enable_stats(self, trace=False, callback=None, trace_limit=10000):
+        """
+        公開メソッドの呼び出し回数, SQLの実行回数, 取得した行数, レイテンシの計測を始める
+        計測していないときは何もしない
+
+        Parameters
+        ----------
+        trace : bool
+            TrueならSQLごとに文, パラメータ, 時間, 行数を記録する
+        callback : function
+            メソッドの呼び出しとSQLの実行が終わるたびにイベントのdictを渡して呼び出す
+        trace_limit : int
+            記録するSQLの件数の上限
+        """
+        from snark import querystats
+        self.disable_stats()
+        stats = querystats.QueryStats(trace, callback, trace_limit)
+        # インスタンスの属性にラップした関数を置いて、クラスのメソッドを隠す
+        for name in dir(type(self)):
+            if name.startswith('_') or name in self.STATS_EXCLUDE:
+                continue
+            attr = getattr(type(self), name)
+            if callable(attr) and not isinstance(attr, type):
+                setattr(self, name, stats.wrap_method(name, getattr(self, name)))
+        self._stats = stats
+
+    def disable_stats(self):
+        """
+        計測をやめる
+        """
+        if self._stats is None:
+            return
+        for name in list(self.__dict__):
+            if not name.startswith('_') and hasattr(type(self), name) and callable(self.__dict__[name]):
+                del self.__dict__[name]
+        self._stats = None
+
+    def reset_stats(self):
+        if self._stats is not None:
+            self._stats.reset()
+
+    def stats(self):
+        """
+        計測結果のスナップショットを取得する, 計測していなければNone
+
+        Returns
+        -------
+        {'methods': {メソッド名: {'calls', 'time', 'sql', 'rows', 'histogram', 'callers'}},
+         'queries': {SQL: {'count', 'time', 'rows'}},
+         'sql': SQLの実行回数, 'rows': 取得した行数,
+         'trace': [{'method', 'sql', 'params', 'time', 'rows'} ...]}
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot()
 
     def __enter__(self):
         return self
 
     def __del__(self):
-        self.conn.close()
+        self.close()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.conn.close()
+        self.close()
+
+    def _get_index_columns(self, table):
+        """
+        テーブルの全インデックスのカラム列を取得する
+        """
+        indexes = []
+        for idx in self.conn.execute('PRAGMA index_list(%s)' % table).fetchall():
+            cols = self.conn.execute(
+                'PRAGMA index_info("%s")' % idx[1]).fetchall()
+            indexes.append(tuple(c[2] for c in cols))
+        return indexes
+
+    @_writer
+    def ensure_indexes(self):
+        """
+        検索で利用するカラムにインデックスがなければ作成する
+
+        Returns
+        -------
+        [インデックス名 ...]
+            作成したインデックス
+        """
+        if self.mode == 'ro':
+            self._check_writable()
+        created = []
+        for (table, cols) in self.INDEXES:
+            # 先頭カラムが一致するインデックスがあれば作成しない
+            exists = False
+            for idx in self._get_index_columns(table):
+                if idx[:len(cols)] == cols:
+                    exists = True
+                    break
+            if exists:
+                continue
+            name = 'snark_%s_%s' % (table, '_'.join(cols))
+            self.conn.execute('CREATE INDEX IF NOT EXISTS %s ON %s(%s)' % (
+                name, table, ', '.join(cols)))
+            created.append(name)
+        if len(created) > 0:
+            self.conn.execute('ANALYZE')
+            self.conn.commit()
+        return created
+
+    def explain_queries(self):
+        """
+        クラスが発行するSQLをEXPLAIN QUERY PLANで調べ、全件走査するものを取得する
+
+        調べるのは、空のDBで公開メソッドを一通り呼び出して集めたSQLと、
+        enable_statsで計測中なら計測を始めてから実行したすべてのSQL
+        enable_statsしてから使い方に合わせてメソッドを呼び出しておくと、実際に発行したSQLを漏れなく調べられる
+        全件を読み書きするのが目的のSQL(先頭がBULK)と、一時テーブルやサブクエリの走査は報告しない
+
+        Returns
+        -------
+        [[SQL 実行計画] ...]
+            DBのテーブルを全件走査(SCAN)するSQLとその実行計画
+        """
+        queries = self._probe_queries()
+        if self._stats is not None:
+            queries += list(self._stats.snapshot()['queries'])
+        scans = []
+        seen = set()
+        # 計測とは別に、書き込み用の接続で調べる(一時テーブルを使うSQLもあるため)
+        with self._write_lock:
+            tables = set(r[0] for r in self._conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'"))
+            for sql in queries:
+                if sql.startswith('CREATE TEMP TABLE IF NOT EXISTS'):
+                    self._conn.execute(sql)
+            for sql in queries:
+                # IN句のプレースホルダの数が違うだけのSQLは1つにまとめる
+                sql = _IN_LIST.sub('IN (?)', sql)
+                if sql in seen or sql.startswith(BULK) or not _EXPLAINABLE.match(sql):
+                    continue
+                seen.add(sql)
+                names = _NAMED_PARAM.findall(sql)
+                if len(names) > 0:
+                    params = dict.fromkeys(names)
+                else:
+                    params = [None] * sql.count('?')
+                # 実行計画には別名が出るので、FROM/JOINの別名からテーブル名を引く
+                aliases = {}
+                for (table, alias) in _TABLE_ALIAS.findall(sql):
+                    aliases[alias or table] = table
+                try:
+                    cur = self._conn.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                except sqlite3.OperationalError:
+                    # snark_seqなど、このDBにまだ作られていないテーブルを使うSQLは調べられない
+                    continue
+                for row in cur:
+                    detail = row[3].split()
+                    if len(detail) >= 2 and detail[0] == 'SCAN' and \
+                            aliases.get(detail[1], detail[1]) in tables:
+                        scans.append([sql, row[3]])
+        return scans
+
+    def _probe_queries(self):
+        """
+        このDBと同じテーブルを持つ空のDBで公開メソッドを一通り呼び出し、発行したSQLを集める
+        """
+        probe = WordNetDb(':memory:')
+        try:
+            for (sql,) in self._conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type='table'"
+                    " AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'snark_%'"):
+                probe._conn.execute(sql)
+            closure = self._get_closure_links()
+            if closure != None:
+                probe.build_closure(*closure)
+            probe.enable_stats()
+
+            probe.add_word('a', 'x')
+            probe.add_word('b', 'x', 'v')
+            probe.add_synlink('x', 'n', 'y', 'n', 'hype')
+            probe.add_synsetdef('x', 'gloss')
+            probe.add_words_bulk([('c', 'y')])
+            probe.add_synlinks_bulk([('y', 'n', 'z', 'n', 'hype')])
+            probe.add_synsetdefs_bulk([('y', 'gloss')])
+            probe.insert_synset_def_all([('x', 'jpn', 'gloss2', None)])
+
+            w = probe.get_words('a')[0]
+            probe.get_words('a', 'n')
+            s = probe.get_synsets(w)[0]
+            probe.get_synset(s.synset)
+            probe.get_words_by_sense(s)
+            probe.get_word_by_id(w.wordid)
+            probe.get_same_words_by_synset(s)
+            probe.get_same_words_by_id(w)
+            probe.get_same_words_by_lemma('a')
+            probe.get_word_info(w)
+            probe.get_word_info_by_lemma('a')
+            probe.get_wordlink_info(w)
+            probe.get_wordlink_info_by_lemma('a')
+            probe.get_imagenet_uris('a')
+            for link in ('', 'hype'):
+                probe.get_synlink2(s, link)
+                probe.get_synlink_info(s, link)
+                probe.get_synlink_info_by_name('x', link)
+                probe.get_synlink_next(s, link, 0, link)
+            probe.get_synlink_next_by_name('x')
+            probe.get_synset_info(s)
+            probe.get_synsetdefs(s)
+            probe.get_synsetdef_info(s)
+            # キーが多いときのjson_eachを使うSQLも集める
+            for n in (1, self.IN_CHUNK + 1):
+                probe.get_synset_def_all([s.synset] * n)
+                probe.get_words_many(['a'] * n)
+                probe.get_words_many(['a'] * n, 'n')
+                probe.get_synsets_many([s.synset] * n)
+            if closure != None:
+                probe.is_a(s.synset, s.synset + '_')
+                probe.ancestors(s.synset)
+                probe.descendants(s.synset)
+
+            probe.delete_synsetdefs(['gloss'])
+            probe.delete_words(['a', 'x'])
+            return list(probe.stats()['queries'])
+        finally:
+            probe.close()
 
     def get_synset_def_all(self, synsets, lang='jpn'):
         """
         synsetリストに対応するsynset_defすべてを取得する
         """
-        c = self.conn.cursor()
-        c.execute('SELECT * FROM synset_def WHERE synset in ({0})'.format(
-            ', '.join('?' for _ in synsets)), synsets)
-        cur = c.fetchall()
-        return cur
+        return self._select_in('SELECT * FROM synset_def WHERE synset IN ({0})', synsets)
+
+    def _order_by_keys(self, rows, keys, col):
+        """
+        行をrow[col]のkeysでの位置の順に並べる(同じ位置の行は元の順)
+        """
+        pos = {}
+        for k in keys:
+            pos.setdefault(k, len(pos))
+        return sorted(rows, key=lambda r: pos[r[col]])
+
+    def get_words_many(self, lemmas, pos='', ordered=True):
+        """
+        言語によらず単語リストのワードをまとめて取得する
+
+        Parameters
+        ----------
+        lemmas : list
+            単語のリスト, 何件でもよい
+        pos : str
+            品詞ID(''なら全て)
+        ordered : bool
+            Trueならlemmasの順に並べる, FalseならDBから取得した順
+
+        Returns
+        -------
+        [Word ...]
+            同じ単語のワードはワードIDの順
+        """
+        lemmas = list(lemmas)
+        if len(pos) > 0:
+            rows = self._select_in(
+                'SELECT * FROM word WHERE lemma IN ({0}) AND pos=? ORDER BY wordid', lemmas, (pos,))
+        else:
+            rows = self._select_in(
+                'SELECT * FROM word WHERE lemma IN ({0}) ORDER BY wordid', lemmas)
+        if ordered:
+            rows = self._order_by_keys(rows, lemmas, 2)
+        return [Word(r[0], r[1], r[2], r[3], r[4]) for r in rows]
+
+    def get_synsets_many(self, ids, ordered=True):
+        """
+        概念IDのリストの概念をまとめて取得する
+
+        Parameters
+        ----------
+        ids : list
+            概念IDのリスト, 何件でもよい
+        ordered : bool
+            Trueならidsの順に並べる, FalseならDBから取得した順
+
+        Returns
+        -------
+        [SynSet ...]
+            ない概念IDは飛ばす
+        """
+        ids = list(ids)
+        rows = self._select_in('SELECT * FROM synset WHERE synset IN ({0}) ORDER BY rowid', ids)
+        if ordered:
+            rows = self._order_by_keys(rows, ids, 0)
+        return [SynSet(r[0], r[1], r[2], r[3]) for r in rows]
+
+    # insert_synset_def_allで1回の集合演算で追加する件数
+    INSERT_CHUNK = 50000
 
+    @_writer
     def insert_synset_def_all(self, data):
         """
         dataリストのうちsynset, def, langのペアが存在しないデータだけDBに追加する
+        dataの中で同じペアがあれば最初の1件だけ追加する
+
+        Parameters
+        ----------
+        data : list
+            [(synset, lang, def, sid) ...]
+
+        Returns
+        -------
+        {'inserted': 追加した件数, 'duplicate': 既にあったか重複していて追加しなかった件数}
         """
-        c = self.conn.cursor()
-        inserts = []
-        updates = []
-        for d in data:
-            synset = d[0]
-            lang = d[1]
-            gloss = d[2]
-            cur = c.execute(
-                'select * from synset_def where (synset=? and def=? and lang=?)', (synset, gloss, lang))
-            e = cur.fetchone()
-            if e != None:
-                updates.append(e)
-            else:
-                inserts.append(d)
-        if len(inserts) > 0:
-            sql = 'INSERT INTO synset_def VALUES(?,?,?,?)'
-            c.executemany(sql, inserts)
-        self.conn.commit()
+        self._check_writable()
+        inserted = 0
+        total = 0
+        it = iter(data)
+        with self.conn:
+            # 一時テーブルに入れて重複を除き、synset_defにないものだけを1回で追加する
+            self.conn.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS snark_synset_def_new'
+                ' (synset text, lang text, def text, sid text, UNIQUE (synset, lang, def))')
+            while True:
+                chunk = list(itertools.islice(it, self.INSERT_CHUNK))
+                if len(chunk) == 0:
+                    break
+                total += len(chunk)
+                self.conn.execute('DELETE FROM temp.snark_synset_def_new')
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO temp.snark_synset_def_new VALUES(?,?,?,?)', chunk)
+                cur = self.conn.execute(
+                    'INSERT INTO synset_def'
+                    ' SELECT n.synset, n.lang, n.def, n.sid FROM temp.snark_synset_def_new n'
+                    ' LEFT JOIN synset_def d ON d.synset=n.synset AND d.def=n.def AND d.lang=n.lang'
+                    ' WHERE d.rowid IS NULL ORDER BY n.rowid')
+                inserted += cur.rowcount
+            self.conn.execute('DELETE FROM temp.snark_synset_def_new')
+        return {'inserted': inserted, 'duplicate': total - inserted}
 
     def get_same_words_by_synset(self, s):
         """
@@ -158,13 +695,9 @@ class WordNetDb:
             概念
             概念のワード
         """
-        info = []
         if not w:
-            return info
-        cur0 = self.get_synsets(w)
-        for s in cur0:
-            info.extend(self.get_same_words_by_synset(s))
-        return info
+            return []
+        return self._get_same_words('w1.wordid=?', (w.wordid,))
 
     def get_same_words_by_lemma(self, lemma):
         """
@@ -179,11 +712,22 @@ class WordNetDb:
             概念
             概念のワード
         """
-        cur = self.get_words(lemma)
-        result = []
-        for w in cur:
-            result.extend(self.get_same_words_by_id(w))
-        return result
+        return self._get_same_words('w1.lemma=?', (lemma,))
+
+    def _get_same_words(self, where, params):
+        """
+        ワード→概念→概念のワードを1回のjoinで取得する
+        """
+        cur = self.conn.execute(
+            'SELECT ss.synset, ss.name, w2.wordid, w2.lemma, w2.pos'
+            ' FROM word w1'
+            ' JOIN sense s1 ON s1.wordid=w1.wordid'
+            ' JOIN synset ss ON ss.synset=s1.synset'
+            ' JOIN sense s2 ON s2.synset=ss.synset'
+            ' JOIN word w2 ON w2.wordid=s2.wordid'
+            ' WHERE ' + where +
+            ' ORDER BY w1.lang, w1.pos, w1.rowid, s1.synset, s1.rowid, s2.wordid, s2.rowid', params)
+        return [list(row) for row in cur]
 
     def get_words(self, name, pos=''):
         """
@@ -201,16 +745,16 @@ class WordNetDb:
         """
         if len(pos) > 0:
             cur = self.conn.execute(
-                "select * from word where (lemma='%s' and pos='%s')" % (name, pos))
+                'select * from word where (lemma=? and pos=?)', (name, pos))
         else:
             cur = self.conn.execute(
-                "select * from word where lemma='%s'" % name)
+                'select * from word where lemma=?', (name,))
         return cur
 
     # ワードから概念を取得
     def get_synsets(self, word):
         cur = self.conn.execute(
-            "select * from sense where wordid='%s'" % word.wordid)
+            'select * from sense where wordid=?', (word.wordid,))
         synsets = []
         for row in cur:
             sense = Sense(row[0])
@@ -221,11 +765,18 @@ class WordNetDb:
 
     # 概念IDから概念を取得
     def get_synset(self, synsetid):
+        if self.cache is not None:
+            s = self.cache['synset'].get(str(synsetid))
+            if s is not None:
+                return s
         cur = self.conn.execute(
-            "select * from synset where synset='%s'" % synsetid)
+            'select * from synset where synset=?', (synsetid,))
         w = cur.fetchone()
         if w:
-            return SynSet(w[0], w[1], w[2], w[3])
+            s = SynSet(w[0], w[1], w[2], w[3])
+            if self.cache is not None:
+                self.cache['synset'].put(str(synsetid), s)
+            return s
         else:
             return None
 
@@ -234,7 +785,7 @@ class WordNetDb:
         概念IDに紐づくワードをすべて取得する
         """
         cur = self.conn.execute(
-            "select * from sense where synset='%s'" % synset.synset)
+            'select * from sense where synset=?', (synset.synset,))
         words = []
         for row in cur:
             w = self.get_word_by_id(row[1])
@@ -245,21 +796,68 @@ class WordNetDb:
         """
         ワードIDからワードを取得する
         """
+        if self.cache is not None:
+            word = self.cache['word'].get(str(wordid))
+            if word is not None:
+                return word
         cur = self.conn.execute(
-            "select * from word where wordid='%s'" % wordid)
+            'select * from word where wordid=?', (wordid,))
         w = cur.fetchone()
         if w:
-            return Word(w[0], w[1], w[2], w[3], w[4])
+            word = Word(w[0], w[1], w[2], w[3], w[4])
+            if self.cache is not None:
+                self.cache['word'].put(str(wordid), word)
+            return word
         else:
             return None
 
 
 
+    # 追加するIDの最小値(8桁はWordNetの予約)
+    ID_START = 100000000
+
+    # まとめて追加するときに一度に確保するIDの数
+    ID_BLOCK = 1000
+
+    def _allocate_ids(self, name, n):
+        """
+        snark_seqテーブルのカウンタからn個の連続したIDを確保する
+
+        Parameters
+        ----------
+        name : str
+            word もしくは synset
+        n : int
+            確保する数
+
+        Returns
+        -------
+        確保した先頭のID
+        """
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS snark_seq (name text primary key, value integer)')
+        if self.conn.execute('SELECT value FROM snark_seq WHERE name=?', (name,)).fetchone() == None:
+            # 初回は既存IDの最大値の次から払い出す
+            if name == 'word':
+                cur = self.conn.execute(BULK + 'SELECT max(wordid) FROM word')
+            else:
+                cur = self.conn.execute(
+                    BULK + "SELECT max(CAST(substr(synset, 1, instr(synset, '-') - 1) AS INTEGER)) FROM synset")
+            m = cur.fetchone()[0]
+            start = self.ID_START if m == None else max(self.ID_START, m + 1)
+            self.conn.execute(
+                'INSERT OR IGNORE INTO snark_seq VALUES(?,?)', (name, start))
+        self.conn.execute(
+            'UPDATE snark_seq SET value=value+? WHERE name=?', (n, name))
+        cur = self.conn.execute(
+            'SELECT value FROM snark_seq WHERE name=?', (name,))
+        return cur.fetchone()[0] - n
+
     def _create_word_id(self):
-        return int(time.time() * 100)
+        return self._allocate_ids('word', 1)
 
     def _create_synset_id(self, pos):
-        return str(self._create_word_id()) + '-' + pos
+        return str(self._allocate_ids('synset', 1)) + '-' + pos
 
     def _get_word_by_name(self, name, lang='jpn'):
         cur = self.conn.execute(
@@ -267,17 +865,17 @@ class WordNetDb:
         return cur
 
     def _get_synset_by_name(self, name):
-        cur = self.conn.execute("select * from synset where name='%s'" % name)
+        cur = self.conn.execute('select * from synset where name=?', (name,))
         return cur
 
     def _get_synset1_by_name(self, name):
-        cur = self.conn.execute("select * from synset where name='%s'" % name)
+        cur = self.conn.execute('select * from synset where name=?', (name,))
         s = cur.fetchone()
         return SynSet(s[0], s[1], s[2], s[3])
 
     def _get_synlink(self, synset1, synset2, link):
         cur = self.conn.execute(
-            "select * from synlink where (synset1='%s' and synset2='%s' and link='%s')" % (synset1, synset2, link))
+            'select * from synlink where (synset1=? and synset2=? and link=?)', (synset1, synset2, link))
         return cur
 
     def _get_synsetdef_by_gloss(self, synset_id, gloss, lang='jpn'):
@@ -290,7 +888,9 @@ class WordNetDb:
         return cur
 
     # ワードを記憶する
+    @_writer
     def add_word(self, name, synset=None, pos='n', lang='jpn'):
+        self._check_writable()
         src = 'snark'
         wid = 0
         sid = 0
@@ -301,12 +901,10 @@ class WordNetDb:
         c = cur.fetchone()
         if c == None:
             # なければワードに追加
-            while True:
-                wid = self._create_word_id()
-                if self.get_word_by_id(wid) == None:
-                    break
+            wid = self._create_word_id()
             w = (wid, lang, name, None, pos)
             self.conn.execute('INSERT INTO word VALUES(?,?,?,?,?)', w)
+            self._evict_cache('word', wid)
             commit = True
         else:
             wid = c[0]
@@ -323,38 +921,69 @@ class WordNetDb:
             self.conn.commit()
 
     # ワードを忘れる
+    @_writer
     def delete_word(self, name, lang='jpn'):
-        wids = []
-        sids = []
-        commit = False
+        return self.delete_words([name], lang)
 
-        cur = self._get_word_by_name(name, lang)
-        for c in cur:
-            # ワードIDに一致するwordとsenseを削除
-            wids.append(c[0])
-            self.conn.execute('DELETE FROM word WHERE wordid=?', (c[0],))
-            self.conn.execute('DELETE FROM sense WHERE wordid=?', (c[0],))
-            commit = True
+    @_writer
+    def delete_words(self, names, lang='jpn'):
+        """
+        単語リストのワードと、単語を概念名に持つ概念をまとめて削除する
 
-        cur = self._get_synset_by_name(name)
-        for c in cur:
-            # 概念IDに一致するsynsetとsenseとsynset_defとsynlinkを削除
-            sids.append(c[0])
-            self.conn.execute('DELETE FROM synset WHERE synset=?', (c[0],))
-            self.conn.execute('DELETE FROM sense WHERE synset=?', (c[0],))
-            self.conn.execute(
-                'DELETE FROM synset_def WHERE (synset=? and lang=?)', (c[0], lang))
-            self.conn.execute(
-                'DELETE FROM synlink WHERE (synset1=? or synset2=?)', (c[0], c[0]))
-            commit = True
+        ワードはwordとsenseから、概念はsynset, sense, synset_def(langのもの), synlinkから
+        集合演算のSQLで1つのトランザクションで削除する
 
-        if commit:
-            self.conn.commit()
+        Parameters
+        ----------
+        names : list
+            単語のリスト
+        lang : str
+            削除するワードと概念の説明の言語
 
+        Returns
+        -------
+        {'word', 'sense', 'synset', 'synset_def', 'synlink'}
+            テーブルごとの削除した行数
+        """
+        self._check_writable()
+        names = self._key_list(names, 'names')
+        removed = {}
+        with self.conn:
+            wids = [r[0] for r in self._select_in(
+                'SELECT wordid FROM word WHERE lemma IN ({0}) AND lang=?', names, (lang,))]
+            sids = [r[0] for r in self._select_in(
+                'SELECT synset FROM synset WHERE name IN ({0})', names)]
+            closure = self._get_closure_links()
+            descendants = set()
+            if closure != None:
+                descendants = set(r[0] for r in self._select_in(
+                    'SELECT descendant FROM snark_closure WHERE ancestor IN ({0})', sids))
+
+            removed['word'] = self._execute_in('DELETE FROM word WHERE wordid IN ({0})', wids)
+            removed['sense'] = self._execute_in('DELETE FROM sense WHERE wordid IN ({0})', wids)
+            removed['synset'] = self._execute_in('DELETE FROM synset WHERE synset IN ({0})', sids)
+            removed['sense'] += self._execute_in('DELETE FROM sense WHERE synset IN ({0})', sids)
+            removed['synset_def'] = self._execute_in(
+                'DELETE FROM synset_def WHERE synset IN ({0}) AND lang=?', sids, (lang,))
+            removed['synlink'] = self._execute_in(
+                'DELETE FROM synlink WHERE synset1 IN ({0})', sids)
+            removed['synlink'] += self._execute_in(
+                'DELETE FROM synlink WHERE synset2 IN ({0})', sids)
+
+            if closure != None and len(sids) > 0:
+                self._closure_remove_synsets(sids, descendants)
+        for wid in wids:
+            self._evict_cache('word', wid)
+        for sid in sids:
+            self._evict_cache('synset', sid)
+        return removed
+
+    @_writer
     def add_synlink(self, synset1, pos1, synset2, pos2, link):
         """
         概念リンクを追加する, 概念がなければ追加する
         """
+        self._check_writable()
         src = 'snark'
         commit = False
 
@@ -379,6 +1008,7 @@ class WordNetDb:
         if c3 == None:
             s = [sid1, sid2, link, src]
             self.conn.execute('INSERT INTO synlink VALUES(?,?,?,?)', s)
+            self._closure_add_link(sid1, sid2, link)
             commit = True
 
         if commit:
@@ -394,20 +1024,19 @@ class WordNetDb:
             c = cur.fetchone()
         if c == None:
             # なければ概念に追加
-            while True:
-                sid = self._create_synset_id(pos)
-                if self.get_synset(sid) == None:
-                    break
+            sid = self._create_synset_id(pos)
             if len(name) == 0:
                 name = sid
             s = (sid, pos, name, src)
             self.conn.execute('INSERT INTO synset VALUES(?,?,?,?)', s)
+            self._evict_cache('synset', sid)
             commit = True
         else:
             sid = c[0]
 
         return (sid, commit)
 
+    @_writer
     def add_synsetdef(self, synset, gloss, pos='n', lang='jpn'):
         """
         文を記憶する
@@ -427,6 +1056,7 @@ class WordNetDb:
         -------
         概念名
         """
+        self._check_writable()
         src = 'snark'
         sid = 0
         commit = False
@@ -448,21 +1078,324 @@ class WordNetDb:
         return synset
 
     # 文を忘れる
+    @_writer
     def delete_synsetdef(self, gloss, lang='jpn'):
-        commit = False
+        return self.delete_synsetdefs([gloss], lang)
 
-        cur = self._get_synsetdef_by_gloss('', gloss, lang)
-        for c in cur:
-            self.conn.execute('DELETE FROM synset_def WHERE def=?', (c[2],))
-            commit = True
+    @_writer
+    def delete_synsetdefs(self, glosses, lang='jpn'):
+        """
+        文のリストのうちlangの説明にある文を、言語によらずsynset_defからまとめて削除する
 
-        if commit:
-            self.conn.commit()
+        Returns
+        -------
+        {'synset_def': 削除した行数}
+        """
+        self._check_writable()
+        glosses = self._key_list(glosses, 'glosses')
+        with self.conn:
+            defs = [r[0] for r in self._select_in(
+                'SELECT DISTINCT def FROM synset_def WHERE def IN ({0}) AND lang=?', glosses, (lang,))]
+            count = self._execute_in('DELETE FROM synset_def WHERE def IN ({0})', defs)
+        return {'synset_def': count}
+
+    # SQLiteのホストパラメータ上限より小さいIN句の件数
+    IN_CHUNK = 500
+
+    def _has_json(self):
+        """
+        SQLiteでjson_eachが使えるか
+        """
+        if self._json is None:
+            try:
+                self.conn.execute("SELECT value FROM json_each('[]')")
+                self._json = True
+            except sqlite3.OperationalError:
+                self._json = False
+        return self._json
+
+    def _in_statements(self, sql, keys, params=()):
+        """
+        IN ({0})を含むSQLをkeysについて実行する(SQL, パラメータ)を順に返す
+        paramsはIN句の後ろのパラメータ
+
+        keysがIN_CHUNK件以下ならプレースホルダを並べて1回で実行する
+        それより多ければkeysをJSONの配列1つにしてjson_eachで展開し、1回で実行する
+        json_eachが使えなければIN_CHUNK件ずつ分けて実行する
+        """
+        keys = list(dict.fromkeys(keys))
+        if len(keys) > self.IN_CHUNK and self._has_json():
+            yield (sql.format('SELECT value FROM json_each(?)'),
+                   [json.dumps(keys)] + list(params))
+            return
+        for i in range(0, len(keys), self.IN_CHUNK):
+            chunk = keys[i:i + self.IN_CHUNK]
+            yield (sql.format(', '.join('?' for _ in chunk)), chunk + list(params))
+
+    def _select_in(self, sql, keys, params=()):
+        """
+        IN ({0})を含むSQLをkeysについて実行し、全行を取得する
+        """
+        rows = []
+        for (q, p) in self._in_statements(sql, keys, params):
+            rows.extend(self.conn.execute(q, p).fetchall())
+        return rows
+
+    def _execute_in(self, sql, keys, params=()):
+        """
+        IN ({0})を含む更新のSQLをkeysについて実行し、変更した行数を返す
+        """
+        count = 0
+        for (q, p) in self._in_statements(sql, keys, params):
+            count += self.conn.execute(q, p).rowcount
+        return count
+
+    def _id_allocator(self, name):
+        """
+        IDをID_BLOCK個ずつ確保して1つずつ払い出す関数を作る
+        """
+        block = [0, 0]
+
+        def alloc():
+            if block[0] == block[1]:
+                block[0] = self._allocate_ids(name, self.ID_BLOCK)
+                block[1] = block[0] + self.ID_BLOCK
+            block[0] += 1
+            return block[0] - 1
+        return alloc
+
+    def _word_id_allocator(self):
+        """
+        ワードIDを順に払い出す関数を作る
+        """
+        return self._id_allocator('word')
+
+    def _synset_id_allocator(self):
+        """
+        品詞IDを受け取り概念IDを順に払い出す関数を作る
+        """
+        alloc = self._id_allocator('synset')
+        return lambda pos: str(alloc()) + '-' + pos
+
+    def _get_synsets_by_names(self, names):
+        """
+        概念名ごとに最初に一致する概念IDを取得する
+        """
+        synsets = {}
+        rows = self._select_in(
+            'SELECT synset, name FROM synset WHERE name IN ({0}) ORDER BY rowid',
+            set(n for n in names if len(n) > 0))
+        for r in rows:
+            if r[1] not in synsets:
+                synsets[r[1]] = r[0]
+        return synsets
+
+    def _add_synset_bulk(self, name, pos, synsets, sids, inserts):
+        """
+        _add_synsetと同じ判定でsynsetsにない概念をinsertsに追加する
+        """
+        if len(name) > 0 and name in synsets:
+            return (synsets[name], False)
+        sid = sids(pos)
+        if len(name) == 0:
+            name = sid
+        inserts.append((sid, pos, name, 'snark'))
+        synsets[name] = sid
+        return (sid, True)
+
+    def _key_list(self, keys, name):
+        """
+        キーのリストの引数をlistにする
+        文字列をそのままlistにすると1文字ずつのキーになってしまうので受け付けない
+        """
+        if isinstance(keys, (str, bytes)):
+            raise TypeError('%s must be a list of keys, not %s' % (name, type(keys).__name__))
+        return list(keys)
+
+    def _bulk_items(self, items, required, defaults=()):
+        """
+        一括メソッドの引数の各要素を、省略した値を補ったタプルにする
+
+        Parameters
+        ----------
+        required : int
+            省略できない値の数
+        defaults : tuple
+            省略できる値の既定値
+        """
+        rows = []
+        for i in items:
+            # 文字列をそのままタプルにすると1文字ずつに分かれてしまう
+            if isinstance(i, (str, bytes, dict)) or not hasattr(i, '__len__') or not hasattr(i, '__getitem__'):
+                raise TypeError('bulk item must be a tuple or list, not %s' % type(i).__name__)
+            if not required <= len(i) <= required + len(defaults):
+                raise ValueError('bulk item must have %d to %d values: %r' % (
+                    required, required + len(defaults), i))
+            rows.append(tuple(i) + tuple(defaults[len(i) - required:]))
+        return rows
+
+    def _executemany(self, table, sql, rows):
+        if len(rows) > 0:
+            self.conn.executemany(sql, rows)
+            for r in rows:
+                if table == 'word':
+                    self._evict_cache('word', r[0])
+                elif table == 'synset':
+                    self._evict_cache('synset', r[0])
+
+    @_writer
+    def add_words_bulk(self, items):
+        """
+        ワードをまとめて記憶する
+
+        Parameters
+        ----------
+        items : iterable
+            [(単語, 概念名, 品詞ID, 言語ID) ...]
+            概念名以降は省略可能, add_wordの引数と同じ
+
+        Returns
+        -------
+        {'word': 追加したワード数, 'synset': 追加した概念数,
+         'sense': 追加したリンク数, 'skipped': 何も追加しなかった件数}
+        """
+        self._check_writable()
+        items = self._bulk_items(items, 1, (None, 'n', 'jpn'))
+
+        # 既存のワードと概念をまとめて取得する
+        words = {}
+        rows = self._select_in(
+            'SELECT wordid, lemma, lang FROM word WHERE lemma IN ({0}) ORDER BY rowid',
+            set(i[0] for i in items))
+        for r in rows:
+            if (r[1], r[2]) not in words:
+                words[(r[1], r[2])] = r[0]
+        synsets = self._get_synsets_by_names(
+            [i[1] if i[1] != None else i[0] for i in items])
+
+        wids = self._word_id_allocator()
+        sids = self._synset_id_allocator()
+        word_inserts = []
+        synset_inserts = []
+        sense_inserts = []
+        skipped = 0
+        for (name, synset, pos, lang) in items:
+            commit = False
+            wid = words.get((name, lang))
+            if wid == None:
+                wid = wids()
+                word_inserts.append((wid, lang, name, None, pos))
+                words[(name, lang)] = wid
+                commit = True
+            if synset != None:
+                name = synset
+            (sid, added) = self._add_synset_bulk(
+                name, pos, synsets, sids, synset_inserts)
+            if commit or added:
+                sense_inserts.append((sid, wid, lang, None, None, None, 'snark'))
+            else:
+                skipped += 1
+
+        with self.conn:
+            self._executemany('word', 'INSERT INTO word VALUES(?,?,?,?,?)', word_inserts)
+            self._executemany('synset', 'INSERT INTO synset VALUES(?,?,?,?)', synset_inserts)
+            self._executemany('sense', 'INSERT INTO sense VALUES(?,?,?,?,?,?,?)', sense_inserts)
+        return {'word': len(word_inserts), 'synset': len(synset_inserts),
+                'sense': len(sense_inserts), 'skipped': skipped}
+
+    @_writer
+    def add_synlinks_bulk(self, items):
+        """
+        概念リンクをまとめて追加する, 概念がなければ追加する
+
+        Parameters
+        ----------
+        items : iterable
+            [(概念名1, 品詞ID1, 概念名2, 品詞ID2, リンク) ...]
+            add_synlinkの引数と同じ
+
+        Returns
+        -------
+        {'synset': 追加した概念数, 'synlink': 追加したリンク数,
+         'skipped': 何も追加しなかった件数}
+        """
+        self._check_writable()
+        items = self._bulk_items(items, 5)
+        synsets = self._get_synsets_by_names(
+            [i[0] for i in items] + [i[2] for i in items])
+        links = set(self._select_in(
+            'SELECT synset1, synset2, link FROM synlink WHERE synset1 IN ({0})',
+            set(synsets.values())))
+
+        sids = self._synset_id_allocator()
+        synset_inserts = []
+        synlink_inserts = []
+        skipped = 0
+        for (synset1, pos1, synset2, pos2, link) in items:
+            (sid1, added1) = self._add_synset_bulk(
+                synset1, pos1, synsets, sids, synset_inserts)
+            (sid2, added2) = self._add_synset_bulk(
+                synset2, pos2, synsets, sids, synset_inserts)
+            if (sid1, sid2, link) not in links:
+                links.add((sid1, sid2, link))
+                synlink_inserts.append((sid1, sid2, link, 'snark'))
+            elif not added1 and not added2:
+                skipped += 1
+
+        with self.conn:
+            self._executemany('synset', 'INSERT INTO synset VALUES(?,?,?,?)', synset_inserts)
+            self._executemany('synlink', 'INSERT INTO synlink VALUES(?,?,?,?)', synlink_inserts)
+            for l in synlink_inserts:
+                self._closure_add_link(l[0], l[1], l[2])
+        return {'synset': len(synset_inserts), 'synlink': len(synlink_inserts),
+                'skipped': skipped}
+
+    @_writer
+    def add_synsetdefs_bulk(self, items):
+        """
+        文をまとめて記憶する
+
+        Parameters
+        ----------
+        items : iterable
+            [(概念名, 文, 品詞ID, 言語ID) ...]
+            品詞ID以降は省略可能, add_synsetdefの引数と同じ
+
+        Returns
+        -------
+        {'synset': 追加した概念数, 'synset_def': 追加した文の数,
+         'skipped': 何も追加しなかった件数}
+        """
+        self._check_writable()
+        items = self._bulk_items(items, 2, ('n', 'jpn'))
+        synsets = self._get_synsets_by_names([i[0] for i in items])
+        defs = set(self._select_in(
+            'SELECT synset, def, lang FROM synset_def WHERE synset IN ({0})',
+            set(synsets.values())))
+
+        sids = self._synset_id_allocator()
+        synset_inserts = []
+        def_inserts = []
+        skipped = 0
+        for (synset, gloss, pos, lang) in items:
+            (sid, added) = self._add_synset_bulk(
+                synset, pos, synsets, sids, synset_inserts)
+            if (sid, gloss, lang) not in defs:
+                defs.add((sid, gloss, lang))
+                def_inserts.append((sid, lang, gloss, 'snark'))
+            elif not added:
+                skipped += 1
+
+        with self.conn:
+            self._executemany('synset', 'INSERT INTO synset VALUES(?,?,?,?)', synset_inserts)
+            self._executemany('synset_def', 'INSERT INTO synset_def VALUES(?,?,?,?)', def_inserts)
+        return {'synset': len(synset_inserts), 'synset_def': len(def_inserts),
+                'skipped': skipped}
 
     # 概念から説明を取得
     def get_synsetdefs(self, synset, lang='jpn'):
         cur = self.conn.execute(
-            "select * from synset_def where (synset='%s' and lang='%s')" % (synset.synset, lang))
+            'select * from synset_def where (synset=? and lang=?)', (synset.synset, lang))
         synsets = []
         for row in cur:
             synsets.append(SynSetDef(row[0], synset.name, row[2]))
@@ -472,10 +1405,10 @@ class WordNetDb:
     def get_synlink2(self, synset, link=''):
         if len(link) > 0:
             cur = self.conn.execute(
-                "select * from synlink where (synset1='%s' and link='%s')" % (synset.synset, link))
+                'select * from synlink where (synset1=? and link=?)', (synset.synset, link))
         else:
             cur = self.conn.execute(
-                "select * from synlink where synset1='%s'" % synset.synset)
+                'select * from synlink where synset1=?', (synset.synset,))
         hierarchy_dict = []
         for w in cur:
             hierarchy_dict.append(SynLink(w[0], w[1], w[2]))
@@ -494,11 +1427,7 @@ class WordNetDb:
             概念
             概念のワード
         """
-        cur = self.get_words(lemma)
-        result = []
-        for w in cur:
-            result.extend(self.get_word_info(w))
-        return result
+        return self._get_word_info('w1.lemma=?', (lemma,))
 
     def get_word_info(self, w):
         """
@@ -513,14 +1442,63 @@ class WordNetDb:
             概念
             概念のワード
         """
-        info = []
         if not w:
-            return info
-        cur0 = self.get_synsets(w)
-        for s in cur0:
-            info.extend(self.get_synset_info(s))
+            return []
+        return self._get_word_info('w1.wordid=?', (w.wordid,))
+
+    def _get_word_info(self, where, params, lang='jpn'):
+        """
+        ワードの概念と概念のワードを1回のjoinで取得し、例文をもう1回で取得する
+        """
+        cur = self.conn.execute(
+            'SELECT ss.synset, ss.name, ss.pos, w2.wordid, w2.lemma, w2.pos, s1.rowid'
+            ' FROM word w1'
+            ' JOIN sense s1 ON s1.wordid=w1.wordid'
+            ' JOIN synset ss ON ss.synset=s1.synset'
+            ' LEFT JOIN sense s2 ON s2.synset=ss.synset'
+            ' LEFT JOIN word w2 ON w2.wordid=s2.wordid'
+            ' WHERE ' + where +
+            ' ORDER BY w1.lang, w1.pos, w1.rowid, s1.synset, s1.rowid, s2.wordid, s2.rowid', params)
+        rows = cur.fetchall()
+        glosses = self._get_glosses_by_word(where, params, lang)
+
+        info = []
+        prev = None
+        for row in rows:
+            # ワードの概念(sense)の切り替わりで概念行を出力する
+            key = row[6]
+            if key != prev:
+                prev = key
+                info.append(['', 'synset', row[0], row[1], row[2],
+                             self._join_glosses(glosses.get(row[0], []))])
+            if row[3] != None:
+                info.append([row[0], 'word', row[3], row[4], row[5]])
         return info
 
+    def _get_glosses_by_word(self, where, params, lang='jpn'):
+        """
+        ワードの概念の例文を概念IDごとにまとめて取得する
+        """
+        cur = self.conn.execute(
+            'SELECT synset, def FROM synset_def'
+            ' WHERE lang=? AND synset IN ('
+            'SELECT s1.synset FROM word w1'
+            ' JOIN sense s1 ON s1.wordid=w1.wordid'
+            ' WHERE ' + where + ')'
+            ' ORDER BY synset, def, rowid', (lang,) + tuple(params))
+        glosses = {}
+        for row in cur:
+            glosses.setdefault(row[0], []).append(row[1])
+        return glosses
+
+    def _join_glosses(self, glosses):
+        gloss = ''
+        for g in glosses:
+            if len(gloss) > 0:
+                gloss += ","
+            gloss += g
+        return gloss
+
     def get_wordlink_info_by_lemma(self, lemma):
         """
         単語と同じ概念に関係する概念を持つ同義語をすべて取得する
@@ -535,11 +1513,32 @@ class WordNetDb:
             関係する概念
             関係する概念のワード
         """
-        cur = self.get_words(lemma)
-        result = []
-        for w in cur:
-            result.extend(self.get_wordlink_info(w))
-        return result
+        return list(self.iter_wordlink_info_by_lemma(lemma))
+
+    def iter_wordlink_info_by_lemma(self, lemma, limit=0, offset=0):
+        """
+        get_wordlink_info_by_lemmaの結果を1回のSQLのカーソルから順に取得する
+
+        Parameters
+        ----------
+        lemma : str
+            単語
+        limit : int
+            取得する行数の上限(0なら無制限)
+        offset : int
+            読み飛ばす行数
+
+        Returns
+        -------
+        get_wordlink_info_by_lemmaの行のジェネレータ
+        """
+        return self._paginate(self._iter_synlink_info(
+            'word w0'
+            ' JOIN sense s0 ON s0.wordid=w0.wordid'
+            ' JOIN synset ss0 ON ss0.synset=s0.synset'
+            ' JOIN synlink l ON l.synset1=ss0.synset',
+            'w0.lemma=?', (lemma,),
+            ('w0.lang', 'w0.pos', 'w0.rowid', 's0.synset', 's0.rowid', 'ss0.rowid')), limit, offset)
 
     # 関連する概念の単語をすべて取得する
     def get_wordlink_info(self, w):
@@ -578,31 +1577,128 @@ class WordNetDb:
             関係する概念
             関係する概念のワード
         """
-        # 一致するsynsetリストを取得
-        cur0 = self._get_synset_by_name(synset_name)
-        info = []
-        for s in cur0:
-            synset = SynSet(s[0], s[1], s[2], s[3])
-            # synsetのlinkを取得
-            info.extend(self.get_synlink_info(synset, link))
-        return info
+        return list(self.iter_synlink_info_by_name(synset_name, link))
+
+    def iter_synlink_info_by_name(self, synset_name, link='', limit=0, offset=0):
+        """
+        get_synlink_info_by_nameの結果を1回のSQLのカーソルから順に取得する
+
+        Parameters
+        ----------
+        synset_name : str
+            概念名
+        link : str
+            関係(''なら全て)
+        limit : int
+            取得する行数の上限(0なら無制限)
+        offset : int
+            読み飛ばす行数
+
+        Returns
+        -------
+        get_synlink_info_by_nameの行のジェネレータ
+        """
+        (where, params) = self._link_where('ss0.name=?', (synset_name,), link)
+        return self._paginate(self._iter_synlink_info(
+            'synset ss0 JOIN synlink l ON l.synset1=ss0.synset',
+            where, params, ('ss0.rowid',)), limit, offset)
 
     # 概念に紐づく単語をすべて取得する
     def get_synset_info(self, s, parent=''):
-        info = []
+        return list(self.iter_synset_info(s, parent))
+
+    def iter_synset_info(self, s, parent='', limit=0, offset=0):
+        """
+        get_synset_infoの結果をカーソルから順に取得する
+
+        Parameters
+        ----------
+        s : SynSet
+            概念
+        parent : str
+            概念行の親の概念ID
+        limit : int
+            取得する行数の上限(0なら無制限)
+        offset : int
+            読み飛ばす行数
+
+        Returns
+        -------
+        [parent 'synset' synset-id name pos-id gloss]
+        [synset-id 'word' id name pos-id] ...
+            のジェネレータ
+        """
+        return self._paginate(self._iter_synset_info(s, parent), limit, offset)
+
+    def _iter_synset_info(self, s, parent):
         if not s:
-            return info
+            return
         cur1 = self.get_synsetdefs(s)
-        gloss = ''
-        for row1 in cur1:
-            if len(gloss) > 0:
-                gloss += ","
-            gloss += row1.gloss
-        info.append([parent, "synset", s.synset, s.name, s.pos, gloss])
-        words = self.get_words_by_sense(s)
-        for w in words:
-            info.append([s.synset, "word", w.wordid, w.lemma, w.pos])
-        return info
+        gloss = self._join_glosses([row1.gloss for row1 in cur1])
+        yield [parent, "synset", s.synset, s.name, s.pos, gloss]
+        # senseとwordをjoinしてワードを1回で取得する
+        cur2 = self.conn.execute(
+            'SELECT w.wordid, w.lemma, w.pos FROM sense s'
+            ' JOIN word w ON w.wordid=s.wordid'
+            ' WHERE s.synset=? ORDER BY s.wordid, s.rowid', (s.synset,))
+        for w in cur2:
+            yield [s.synset, "word", w[0], w[1], w[2]]
+
+    def _paginate(self, rows, limit, offset):
+        """
+        ジェネレータからoffset行を読み飛ばし、limit行まで取り出す
+        """
+        return itertools.islice(rows, offset, offset + limit if limit > 0 else None)
+
+    def _link_where(self, where, params, link):
+        if len(link) > 0:
+            return (where + ' AND l.link=?', tuple(params) + (link,))
+        return (where, tuple(params))
+
+    def _iter_synlink_info(self, source, where, params, order=()):
+        """
+        関係(l)の関係先の概念と概念のワードを1回のjoinで取得し、
+        get_synlink_infoと同じ行を順に返す
+
+        Parameters
+        ----------
+        source : str
+            synlink lを含むFROM句
+        where : str
+            WHERE句
+        params : tuple
+            WHERE句のパラメータ
+        order : tuple
+            関係より先に並べるカラム
+
+        Notes
+        -----
+        ORDER BYはjoinの順に使うインデックス(ensure_indexesのもの)の並びにして、
+        SQLiteが結果を一時B-treeでソートせずにカーソルから順に返せるようにする
+        関係はsynset1ごとにlink, synset2の順, ワードはwordidの順, 説明は文の順になる
+        """
+        order = tuple(order) + ('l.link', 'l.synset2', 'l.rowid', 'ss.rowid')
+        cur = self.conn.execute(
+            'SELECT l.synset1, l.link, ss.synset, ss.name, ss.pos,'
+            " ifnull((SELECT group_concat(def, ',') FROM ("
+            "  SELECT def FROM synset_def WHERE synset=ss.synset AND lang='jpn' ORDER BY def, rowid)), ''),"
+            ' w.wordid, w.lemma, w.pos, ' + ', '.join(order) +
+            ' FROM ' + source +
+            ' JOIN synset ss ON ss.synset=l.synset2'
+            ' LEFT JOIN sense se ON se.synset=ss.synset'
+            ' LEFT JOIN word w ON w.wordid=se.wordid'
+            ' WHERE ' + where +
+            ' ORDER BY ' + ', '.join(order) + ', se.wordid, se.rowid', params)
+        prev = None
+        for row in cur:
+            # 関係の切り替わりで関係行と概念行を出力する
+            key = row[9:]
+            if key != prev:
+                prev = key
+                yield [row[0], row[1], row[2], row[3], row[4]]
+                yield [row[0], 'synset', row[2], row[3], row[4], row[5]]
+            if row[6] != None:
+                yield [row[2], 'word', row[6], row[7], row[8]]
 
     def get_imagenet_uris(self, lemma):
         """
@@ -660,59 +1756,97 @@ class WordNetDb:
 
     # リンクされている概念に紐づく単語をすべて取得する
     def get_synlink_info(self, s, link=''):
-        info = []
+        return list(self.iter_synlink_info(s, link))
+
+    def iter_synlink_info(self, s, link='', limit=0, offset=0):
+        """
+        get_synlink_infoの結果を1回のSQLのカーソルから順に取得する
+
+        Parameters
+        ----------
+        s : SynSet
+            概念
+        link : str
+            関係(''なら全て)
+        limit : int
+            取得する行数の上限(0なら無制限)
+        offset : int
+            読み飛ばす行数
+
+        Returns
+        -------
+        [synset-id link synset-id name pos-id]
+        [synset-id 'synset' synset-id name pos-id gloss]
+        [synset-id 'word' id name pos-id] ...
+            のジェネレータ
+            関係ごとに関係行, 関係先の概念行, 関係先のワード行の順
+        """
         if not s:
-            return info
+            return iter([])
         # 関係先しか取得しない
         # 関係元しかない関係は、この概念からのリンクがまだ学習されていないことを示す
-        synlinks = self.get_synlink2(s, link)
-        cur2 = []
-
-        # 関係先の概念を取得
-        for row in synlinks:
-            row1 = self.get_synset(row.synset2)
-            if row1 != None:
-                cur2.append(
-                    [s.synset, row.link, row1.synset, row1.name, row1.pos])
-
-        # 概念定義と関係するワードを取得
-        for row2 in cur2:
-            info.append(row2)
-            synset = self.get_synset(row2[2])
-            info.extend(self.get_synset_info(synset, s.synset))
-        return info
+        (where, params) = self._link_where('l.synset1=?', (s.synset,), link)
+        return self._paginate(self._iter_synlink_info('synlink l', where, params), limit, offset)
 
-    def get_synlink_next_by_name(self, synset_name, link='next'):
+    def get_synlink_next_by_name(self, synset_name, link='next', max_depth=0, next_link=''):
         """
         概念のnext linkを取得する
         """
         synset = self._get_synset1_by_name(synset_name)
-        return self.get_synlink_next(synset, link)
+        return self.get_synlink_next(synset, link, max_depth, next_link)
 
-    def get_synlink_next(self, s, link=''):
+    def get_synlink_next(self, s, link='', max_depth=0, next_link=''):
         """
         linkでつながっている概念をすべて取得する
         """
-        info = []
         if not s:
-            return info
-        # 関係先しか取得しない
-        # 関係元しかない関係は、この概念からのリンクがまだ学習されていないことを示す
-        synlinks = self.get_synlink2(s, link)
-        cur2 = []
-
-        # 関係先の概念を取得
-        for row in synlinks:
-            row1 = self.get_synsetdef_info(SynSet(row.synset2))
-            if row1 != None:
-                row2 = row1[0]
-                nxt = row2[2]
-                cur2.append(
-                    [s.synset, row.link, nxt, row2[1], row2[2], row2[5]])
-                cur3 = self._get_synset1_by_name(nxt)
-                cur2.extend(self.get_synlink_next(cur3))
-
-        return cur2
+            return []
+        return list(self.iter_synlink_next(s, link, max_depth, next_link))
+
+    def iter_synlink_next(self, s, link='', max_depth=0, next_link=''):
+        """
+        linkでつながっている概念をWITH RECURSIVEの1回のSQLで順に取得する
+
+        Parameters
+        ----------
+        s : SynSet
+            起点の概念
+        link : str
+            起点からの関係(''なら全て)
+        max_depth : int
+            たどる深さの上限(0なら無制限)
+        next_link : str
+            2段目以降の関係(''なら全て)
+
+        Returns
+        -------
+        [synset-id link next-synset-id 'synsetdef' next-synset-id gloss] のジェネレータ
+            深さ優先順に返す
+            関係先の概念名と同じ概念名を持つ概念から次をたどる
+            たどった経路にある概念に戻る関係は返すが、その先はたどらない
+        """
+        # kはsynlinkのrowidをつないだ経路で、kの順に取り出すと深さ優先順になる
+        cur = self.conn.execute(
+            'WITH RECURSIVE walk(synset1, link, synset2, depth, path, cycle, k) AS ('
+            " SELECT synset1, link, synset2, 1, '/' || synset1 || '/',"
+            "  synset1 = synset2, printf('%012d', rowid)"
+            ' FROM synlink WHERE synset1=:start AND (:link=\'\' OR link=:link)'
+            ' UNION ALL'
+            " SELECT l.synset1, l.link, l.synset2, w.depth + 1, w.path || l.synset1 || '/',"
+            "  instr(w.path || l.synset1 || '/', '/' || l.synset2 || '/') > 0,"
+            "  w.k || printf('%012d', l.rowid)"
+            ' FROM walk w'
+            ' JOIN synset s ON s.name=w.synset2'
+            ' JOIN synlink l ON l.synset1=s.synset'
+            ' WHERE w.cycle=0 AND (:max_depth=0 OR w.depth<:max_depth)'
+            '  AND (:next_link=\'\' OR l.link=:next_link)'
+            ' ORDER BY 7)'
+            ' SELECT synset1, link, synset2, ifnull((SELECT group_concat(def, \',\') FROM ('
+            "  SELECT def FROM synset_def WHERE synset=walk.synset2 AND lang='jpn' ORDER BY rowid)), '')"
+            ' FROM walk',
+            {'start': s.synset, 'link': link, 'max_depth': max_depth, 'next_link': next_link})
+        for row in cur:
+            yield [row[0], row[1], row[2], 'synsetdef', row[2], row[3]]
 
     def get_synsetdef_info(self, s, parent=''):
         """
@@ -729,3 +1863,379 @@ class WordNetDb:
             gloss += row1.gloss
         info.append([parent, "synsetdef", s.synset, s.name, s.pos, gloss])
         return info
+
+    # 推移閉包を作る上位関係(synset2がsynset1の上位)と下位関係(synset2がsynset1の下位)
+    CLOSURE_UP = ('hype', 'isa')
+    CLOSURE_DOWN = ('hypo',)
+
+    def _get_closure_links(self):
+        """
+        推移閉包テーブルの作成に使った関係を取得する, 作成していなければNone
+        """
+        # 作成していないこと(False)も覚えて、add_synlinkのたびに調べないようにする
+        if self._closure is None:
+            cur = self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name='snark_closure_links'")
+            if cur.fetchone() == None:
+                self._closure = False
+                return None
+            up = []
+            down = []
+            for r in self.conn.execute('SELECT link, dir FROM snark_closure_links'):
+                if r[1] == 'up':
+                    up.append(r[0])
+                else:
+                    down.append(r[0])
+            self._closure = (tuple(up), tuple(down))
+        if self._closure is False:
+            return None
+        return self._closure
+
+    def _check_closure(self):
+        if self._get_closure_links() == None:
+            raise NoClosureError('snark_closure does not exist; call build_closure() first')
+
+    @_writer
+    def build_closure(self, up=CLOSURE_UP, down=CLOSURE_DOWN):
+        """
+        上位下位関係の推移閉包テーブル(snark_closure)を作る
+
+        Parameters
+        ----------
+        up : tuple
+            synset2がsynset1の上位であることを示す関係
+        down : tuple
+            synset2がsynset1の下位であることを示す関係
+
+        Returns
+        -------
+        推移閉包テーブルの行数
+        """
+        self._check_writable()
+        self._closure = None
+        with self.conn:
+            self.conn.execute('DROP TABLE IF EXISTS snark_closure')
+            self.conn.execute('DROP TABLE IF EXISTS snark_closure_links')
+            self.conn.execute(
+                'CREATE TABLE snark_closure (ancestor text, descendant text, depth integer,'
+                ' PRIMARY KEY (ancestor, descendant))')
+            self.conn.execute(
+                'CREATE INDEX snark_closure_descendant ON snark_closure(descendant, depth)')
+            self.conn.execute(
+                'CREATE TABLE snark_closure_links (link text, dir text)')
+            self.conn.executemany('INSERT INTO snark_closure_links VALUES(?,?)',
+                                  [(l, 'up') for l in up] + [(l, 'down') for l in down])
+
+            self._fill_closure(up, down)
+        self._closure = (tuple(up), tuple(down))
+        return self.conn.execute(BULK + 'SELECT count(*) FROM snark_closure').fetchone()[0]
+
+    def _fill_closure(self, up, down):
+        """
+        空の推移閉包テーブルを作る
+        """
+        # 深さ1の関係から始めて、1段ずつ深い関係を追加する
+        # 循環していても自分自身への関係は持たない
+        self.conn.execute(
+            BULK + 'INSERT OR IGNORE INTO snark_closure'
+            ' SELECT synset2, synset1, 1 FROM synlink WHERE link IN ({0}) AND synset1!=synset2'
+            ' UNION SELECT synset1, synset2, 1 FROM synlink WHERE link IN ({1}) AND synset1!=synset2'.format(
+                ', '.join('?' for _ in up), ', '.join('?' for _ in down)),
+            tuple(up) + tuple(down))
+        depth = 1
+        while True:
+            cur = self.conn.execute(
+                BULK + 'INSERT OR IGNORE INTO snark_closure'
+                ' SELECT c.ancestor, e.descendant, c.depth + 1'
+                ' FROM snark_closure c JOIN snark_closure e'
+                ' ON e.ancestor=c.descendant AND e.depth=1'
+                ' WHERE c.depth=? AND c.ancestor!=e.descendant', (depth,))
+            if cur.rowcount <= 0:
+                break
+            depth += 1
+
+    def _closure_add_link(self, synset1, synset2, link):
+        """
+        追加した関係を推移閉包テーブルに反映する
+        """
+        closure = self._get_closure_links()
+        if closure == None:
+            return
+        if link in closure[0]:
+            (a, d) = (synset2, synset1)
+        elif link in closure[1]:
+            (a, d) = (synset1, synset2)
+        else:
+            return
+        # aの上位とaから、dの下位とdへの関係を追加する
+        self.conn.execute(
+            'INSERT INTO snark_closure'
+            ' SELECT x.ancestor, y.descendant, x.depth + y.depth + 1'
+            ' FROM (SELECT ancestor, depth FROM snark_closure WHERE descendant=:a'
+            '       UNION SELECT :a, 0) x,'
+            '      (SELECT descendant, depth FROM snark_closure WHERE ancestor=:d'
+            '       UNION SELECT :d, 0) y'
+            ' WHERE x.ancestor!=y.descendant'
+            ' ON CONFLICT(ancestor, descendant) DO UPDATE SET depth=min(depth, excluded.depth)',
+            {'a': a, 'd': d})
+
+    def _closure_remove_synsets(self, sids, descendants):
+        """
+        削除した概念を推移閉包テーブルから消し、その下位の上位関係を作り直す
+
+        作り直すのは削除した概念の下位の行だけで、build_closureと同じように
+        深さ1の関係から1段ずつ深い関係をINSERT ... SELECTでまとめて追加する
+
+        Parameters
+        ----------
+        sids : list
+            削除した概念ID
+        descendants : set
+            削除前の削除した概念の下位の概念ID
+        """
+        (up, down) = self._get_closure_links()
+        sids = set(sids)
+        targets = sids | set(descendants)
+        if len(targets) * 2 > self.conn.execute(BULK + 'SELECT count(*) FROM synset').fetchone()[0]:
+            # 概念の半分以上に関わるときは全体を作り直す方が速い
+            self.conn.execute(BULK + 'DELETE FROM snark_closure')
+            self._fill_closure(up, down)
+            return
+        self.conn.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS snark_closure_target (synset text PRIMARY KEY, removed integer)')
+        self.conn.execute('DELETE FROM temp.snark_closure_target')
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO temp.snark_closure_target VALUES(?,?)',
+            [(sid, 1) for sid in sids] + [(d, 0) for d in descendants if d not in sids])
+        self.conn.execute(
+            'DELETE FROM snark_closure'
+            ' WHERE descendant IN (SELECT synset FROM temp.snark_closure_target)'
+            ' OR ancestor IN (SELECT synset FROM temp.snark_closure_target)')
+        if len(set(descendants) - sids) == 0:
+            return
+
+        # 深さ1の上位関係(子, 親)を1回だけ集めて、子から引けるようにする
+        self.conn.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS snark_closure_edge (child text, parent text)')
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS temp.snark_closure_edge_child ON snark_closure_edge(child)')
+        self.conn.execute('DELETE FROM temp.snark_closure_edge')
+        self.conn.execute(
+            BULK + 'INSERT INTO temp.snark_closure_edge'
+            ' SELECT synset1, synset2 FROM synlink WHERE link IN ({0}) AND synset1!=synset2'
+            ' UNION SELECT synset2, synset1 FROM synlink WHERE link IN ({1}) AND synset1!=synset2'.format(
+                ', '.join('?' for _ in up), ', '.join('?' for _ in down)),
+            tuple(up) + tuple(down))
+
+        self.conn.execute(
+            'INSERT OR IGNORE INTO snark_closure'
+            ' SELECT e.parent, e.child, 1'
+            ' FROM temp.snark_closure_target t JOIN temp.snark_closure_edge e ON e.child=t.synset'
+            ' WHERE t.removed=0')
+        depth = 1
+        while True:
+            cur = self.conn.execute(
+                'INSERT OR IGNORE INTO snark_closure'
+                ' SELECT e.parent, c.descendant, c.depth + 1'
+                ' FROM temp.snark_closure_target t'
+                ' JOIN snark_closure c ON c.descendant=t.synset AND c.depth=?'
+                ' JOIN temp.snark_closure_edge e ON e.child=c.ancestor'
+                ' WHERE t.removed=0 AND e.parent!=c.descendant', (depth,))
+            if cur.rowcount <= 0:
+                break
+            depth += 1
+
+    def is_a(self, a, b):
+        """
+        概念aが概念bの下位か判定する
+
+        Parameters
+        ----------
+        a : str
+            概念ID
+        b : str
+            概念ID
+
+        Returns
+        -------
+        True: aがbと同じかbの下位である
+        False: aがbの下位でない
+        """
+        self._check_closure()
+        if a == b:
+            return True
+        cur = self.conn.execute(
+            'SELECT 1 FROM snark_closure WHERE ancestor=? AND descendant=?', (b, a))
+        return cur.fetchone() != None
+
+    def ancestors(self, s, max_depth=0):
+        """
+        概念の上位をすべて取得する
+
+        Returns
+        -------
+        [[synset-id depth] ...]
+            近い順
+        """
+        self._check_closure()
+        cur = self.conn.execute(
+            'SELECT ancestor, depth FROM snark_closure WHERE descendant=?'
+            ' AND (?=0 OR depth<=?) ORDER BY depth, ancestor', (s, max_depth, max_depth))
+        return [list(r) for r in cur]
+
+    def descendants(self, s, max_depth=0):
+        """
+        概念の下位をすべて取得する
+
+        Returns
+        -------
+        [[synset-id depth] ...]
+            近い順
+        """
+        self._check_closure()
+        cur = self.conn.execute(
+            'SELECT descendant, depth FROM snark_closure WHERE ancestor=?'
+            ' AND (?=0 OR depth<=?) ORDER BY depth, descendant', (s, max_depth, max_depth))
+        return [list(r) for r in cur]
+
+    def _get_similarity_index(self):
+        if self._similarity is None:
+            self._check_closure()
+            # numpyは類似度を使うときだけ必要
+            from snark import similarity
+            self._similarity = similarity.SimilarityIndex(self)
+        return self._similarity
+
+    def similarity(self, pairs, measure='path'):
+        """
+        概念もしくは単語のペアの類似度をまとめて計算する
+        build_closureで推移閉包テーブルを作っておくこと
+
+        Parameters
+        ----------
+        pairs : list
+            [(概念IDもしくは単語, 概念IDもしくは単語) ...]
+            単語の場合は単語の概念の組み合わせのうち最も高い類似度にする
+        measure : str
+            path: 1 / (最短距離 + 1)
+            wup: Wu-Palmer類似度 2 * 最も深い共通の上位の深さ / (深さ + 深さ)
+            lch: Leacock-Chodorow類似度 -log((最短距離 + 1) / (2 * 最大の深さ))
+
+        Returns
+        -------
+        ペアごとの類似度のnumpy配列, 共通の上位がなければ0
+        """
+        return self._get_similarity_index().similarity(pairs, measure)
+
+    def similarity_matrix(self, lefts, rights, measure='path'):
+        """
+        lefts×rightsのすべての組み合わせの類似度をまとめて計算する
+
+        Returns
+        -------
+        len(lefts)×len(rights)の類似度のnumpy配列
+        """
+        return self._get_similarity_index().similarity_matrix(lefts, rights, measure)
+
+    def path_similarity(self, pairs):
+        return self.similarity(pairs, 'path')
+
+    def wup_similarity(self, pairs):
+        return self.similarity(pairs, 'wup')
+
+    def lch_similarity(self, pairs):
+        return self.similarity(pairs, 'lch')
+
+    def _get_search_index(self, kana=False):
+        search = self._search
+        if search is None:
+            search = {}
+            self._search = search
+        if kana not in search:
+            from snark import searchindex
+            search[kana] = searchindex.SearchIndex(self, kana)
+        return search[kana]
+
+    def build_search_index(self, kana=False):
+        """
+        単語の検索用の索引を作る
+        作っていなければ最初の検索のときに作られる, DBに書き込むと作り直しになる
+
+        Parameters
+        ----------
+        kana : bool
+            Trueなら片仮名を平仮名にそろえた検索用の索引を作る
+
+        Returns
+        -------
+        索引の見出し語の数
+        """
+        return len(self._get_search_index(kana).keys)
+
+    def _get_words_by_ids(self, wordids):
+        """
+        ワードIDのリストからワードをその順に取得する
+        """
+        rows = self._select_in('SELECT * FROM word WHERE wordid IN ({0})', wordids)
+        words = {}
+        for row in rows:
+            words[row[0]] = Word(row[0], row[1], row[2], row[3], row[4])
+        return [words[w] for w in wordids if w in words]
+
+    def search_prefix(self, prefix, limit=10, kana=False):
+        """
+        前方一致で単語を検索する
+
+        Parameters
+        ----------
+        prefix : str
+            単語もしくは読みの先頭
+        limit : int
+            取得する件数の上限
+        kana : bool
+            Trueなら全角半角, 大文字小文字, 片仮名平仮名を区別しない
+
+        Returns
+        -------
+        [Word ...]
+            見出し語の順
+        """
+        return self._get_words_by_ids(self._get_search_index(kana).prefix(prefix, limit))
+
+    def search_wildcard(self, pattern, limit=10, kana=False):
+        """
+        ワイルドカードで単語を検索する
+
+        Parameters
+        ----------
+        pattern : str
+            *(0文字以上)と?(1文字)を含むパターン
+            先頭がワイルドカードでなければ、その前までの前方一致で候補を絞る
+
+        Returns
+        -------
+        [Word ...]
+            見出し語の順
+        """
+        return self._get_words_by_ids(self._get_search_index(kana).wildcard(pattern, limit))
+
+    def search_fuzzy(self, lemma, max_edits=1, limit=10, kana=False):
+        """
+        編集距離で単語をあいまい検索する
+
+        Parameters
+        ----------
+        lemma : str
+            単語もしくは読み
+        max_edits : int
+            許す編集(挿入, 削除, 置換)の回数
+
+        Returns
+        -------
+        [[Word 編集距離] ...]
+            近い順
+        """
+        found = self._get_search_index(kana).fuzzy(lemma, max_edits, limit)
+        words = self._get_words_by_ids([w for (w, _) in found])
+        dist = dict(found)
+        return [[w, dist[w.wordid]] for w in words]